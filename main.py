@@ -1,41 +1,102 @@
 # -*- coding: utf-8 -*-
 
 
-import blessed
+import argparse
 import time
-import playsound as ps
-import terminal_snake as ts
-# playsound is a little library to play mp3 files.
+# Only the light modules are imported here. blessed, the sounds, the renderer
+# and the game loop are imported when they are needed, so the game starts faster.
 
 
-term = blessed.Terminal()
-# Blessed is a wrapper around the classic curses
+DIFF_RENDER = True
+# If True, only the cells that changed are drawn every frame.
+# Otherwise the whole grid is printed, which is slow for big grids.
 
+PROFILE = False
+PROFILE_FILE = 'snake_profile.json'
+# If True, each phase of the game loop is timed, their p50/p95/p99 are shown
+# next to the steps, and written to PROFILE_FILE at game over.
 
-# These are characters for the snake.
-# on_color are backgrounds. While just color is foreground color,
-# and in color1_on_color2 color1 is foreground and color2 is background.
-# It's like saying color1 on color2.
-body2 = term.on_yellow4 + '  ' + term.normal
-bg2 = term.on_snow3 + '  ' + term.normal
-f2 = term.on_red + '  ' + term.normal
-ct2 = {'head_u': body2, 'head_d': body2,
-       'head_l': body2, 'head_r': body2,
-       'tail_u': body2, 'tail_d': body2,
-       'tail_l': body2, 'tail_r': body2,
-       'empty': bg2, 'fruit': f2}
+TICK_RATE = 5
+# Steps in a second at the start of the game.
 
 
-# term.fullscreen() saves your current console (terminal) screen, and
-# restores it when you exit.
-# term.hidden_cursor() hides the cursor.
-with term.fullscreen(), term.hidden_cursor():
-    print(term.gold + 'SNAKE GAME' + term.normal)
-    ps.playsound('start.mp3', False)
-    time.sleep(2.7)
 
-    input('Press ENTER to continue...')
+def positive_float(text):
+    """
+    Type of the rate arguments. Returns text as a float, if it's greater than 0.
+    """
+    value = float(text)
+    # Written so that nan isn't let in either.
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f'should be greater than 0, not {text}')
+    return value
 
+
+def percent(text):
+    """
+    Type of --speed-up. Returns text as a float, if it's at least 0 and less than 100.
+    """
+    value = float(text)
+    if not 0 <= value < 100:
+        raise argparse.ArgumentTypeError(f'should be at least 0 and less than 100, not {text}')
+    return value
+
+
+def parse_args(argv=None):
+    """
+    Returns the command line arguments of the game.
+    """
+    parser = argparse.ArgumentParser(description='Snake game for the terminal.')
+    parser.add_argument('--length', type=int, help='length of the grid, asked if not given')
+    parser.add_argument('--height', type=int, help='height of the grid, asked if not given')
+    parser.add_argument('--fast', action='store_true',
+                        help='skip the title screen and the waits, load the sounds in the background')
+    parser.add_argument('--no-sound', action='store_true', help="don't play any sound")
+    parser.add_argument('--full-render', action='store_true',
+                        help='print the whole grid every frame, instead of the changed cells')
+    parser.add_argument('--row-render', action='store_true',
+                        help='draw the changed rows, merged by color, instead of the changed cells')
+    parser.add_argument('--tick-rate', type=positive_float, default=TICK_RATE,
+                        help='steps in a second (default: %(default)s)')
+    parser.add_argument('--speed-up', type=percent, default=0.0, metavar='PERCENT',
+                        help='how much faster the steps get with each fruit, in percent')
+    parser.add_argument('--frame-rate', type=positive_float,
+                        help='frames drawn in a second at most, so many steps can share a frame')
+    parser.add_argument('--autopilot', action='store_true',
+                        help='let the snake play on its own, such as for a demo')
+    parser.add_argument('--load', nargs='?', const='snake_save.bin', metavar='FILE',
+                        help='go on with a saved game, saved with S (default: %(const)s)')
+    parser.add_argument('--events', metavar='FILE',
+                        help='add the events of the game to FILE, JSON lines if it ends with .ndjson')
+    parser.add_argument('--profile', action='store_true',
+                        help=f'show the timings of the game loop, and write them to {PROFILE_FILE}')
+    return parser.parse_args(argv)
+
+
+def snake_chars(term):
+    """
+    Assumes term is a blessed.Terminal.
+    Returns the char_dict of the game for term.
+    """
+    # These are characters for the snake.
+    # on_color are backgrounds. While just color is foreground color,
+    # and in color1_on_color2 color1 is foreground and color2 is background.
+    # It's like saying color1 on color2.
+    body2 = term.on_yellow4 + '  ' + term.normal
+    bg2 = term.on_snow3 + '  ' + term.normal
+    f2 = term.on_red + '  ' + term.normal
+    return {'head_u': body2, 'head_d': body2,
+            'head_l': body2, 'head_r': body2,
+            'tail_u': body2, 'tail_d': body2,
+            'tail_l': body2, 'tail_r': body2,
+            'empty': bg2, 'fruit': f2}
+
+
+def ask_size(term, wait):
+    """
+    Asks the length and the height of the grid until they are
+    numbers of at least 3. Returns them.
+    """
     while True:
         print(term.clear, end='')
         length = input('Length: ')
@@ -44,129 +105,200 @@ with term.fullscreen(), term.hidden_cursor():
         try:
             length = int(length)
             height = int(height)
-            break
         except ValueError:
-            time.sleep(1)
+            wait(1)
             input('Length or height is not a number. Press ENTER to retry.')
-        
-        if length < 3 or height < 3:
-            time.sleep(1)
-            input('Length and height should be less than three. Press ENTER to retry.')
-
-    time.sleep(1)
-    print(term.clear + 'Use ARROW keys to move. Press P to pause...')
-    time.sleep(2)
-    print(term.clear + term.normal)
-    # Prompting and taking the data thus far.
-
-    game = ts.Grid(length, height, ct2)
-    snake = game.spawn_new_snake()
-    snake.occupy_space()
-    # Creating some game objects and getting ready.
-
-    f_eaten = 0
-    steps = 0
-    s_list = [snake]
-    f_list = []
-    # Sone in-game variables. f_eaten == number of fruits eaten.
-    # Each step is a full turn of the following loop.
+            continue
+
+        if length >= 3 and height >= 3:
+            return length, height
+        wait(1)
+        input('Length and height should be at least three. Press ENTER to retry.')
+
+
+def play(term, audio, game, diff_render=DIFF_RENDER, profile=PROFILE, row_render=False,
+         autopilot=False, tick_rate=TICK_RATE, speed_up=0.0, frame_rate=None, events_path=None):
+    """
+    Assumes game is a terminal_snake.Game object.
+    Plays it on term until it is over, with the ARROW keys.
+    If row_render is True, the changed rows are drawn instead of the changed cells.
+    If autopilot is True, snake_autopilot plays instead of the keys.
+    tick_rate is the steps in a second, and speed_up the percent it gets faster
+    with each fruit. frame_rate is the frames in a second at most, None for
+    a frame after every step.
+    If events_path is given, the events of the game are added to that file, see snake_events.
+    """
+    import asyncio
+    import snake_loop as sl
+    import snake_profile as sp
+    import snake_render as sr
+    import snake_state as ss
+
+    grid = game.grid
+    profiler = sp.FrameProfiler() if profile else sp.NULL_PROFILER
+    renderer = None
+    if diff_render:
+        # A renderer keeps the changed coordinates of the grid from now on, so
+        # it's only made if it draws the frames, otherwise they would pile up.
+        renderer_class = sr.RowRenderer if row_render else sr.DiffRenderer
+        if not sr.fits_terminal(grid, term):
+            # Too big for the terminal, only a window around the head is drawn.
+            renderer_class = sr.ViewportRenderer
+        renderer = renderer_class(grid, term, profiler=profiler)
+    # Getting ready. Game keeps the rules, and the snake, the fruits and the counters in it.
+
+    messages = []
+    # Messages shown next to the steps, such as after saving.
+
+    def render(session):
+        """
+        Prints the game area, or grid, and the status under it.
+        """
+        status = f'{game.steps} steps x {game.f_eaten} fruit'
+        if messages:
+            status += '  ' + messages[-1]
+        if profiler.enabled:
+            status += '  ' + profiler.status_line()
+
+        if diff_render:
+            renderer.render(game.s_list, game.f_list, status)
+        else:
+            print(term.home, end='')
+            with profiler.phase('run_grid'):
+                grid.run_grid(game.s_list, game.f_list)
+            with profiler.phase('print'):
+                grid.print_grid_list()
+                print(status + term.clear_eol)
+
+    def eat_sound(session):
+        audio.play('eat')
+
+    def save(session):
+        """
+        Saves the game to ss.SAVE_FILE, and pauses it.
+        It can be played again with --load.
+        """
+        ss.save(game, ss.SAVE_FILE)
+        messages.append(f'Saved to {ss.SAVE_FILE}. Press P to go on.')
+        if not session.paused:
+            session.toggle_pause()
+        session.draw()
+
+    def forget_message(session):
+        if messages and not session.paused:
+            messages.clear()
+
+    # The session reads the ARROW keys, P and S while the game goes on, moves the
+    # snake tick_rate times a second and prints the grid between the moves.
+    # Snake can only turn by 90 degrees, game.step ignores the 180 turns.
+    # If snake crash, or there is no space left to move, then game over.
+    policy = None
+    if autopilot:
+        import snake_autopilot
+        policy = snake_autopilot.Autopilot(*grid.grid_area)
+    writer = events = None
+    if events_path is not None:
+        import snake_events as se
+        writer = se.writer_for(events_path)
+        # Games are numbered by the second they start, so the games of many runs
+        # in the same file can be told apart.
+        events = se.EventStream(game, writer.write, game_number=int(time.time()))
+
+    session = sl.Session(game, sl.terminal_key_reader(term), render, tick=1/tick_rate,
+                         on_eat=eat_sound, profiler=profiler,
+                         on_step=forget_message, on_save=save, policy=policy,
+                         speed_up=speed_up/100, frame_rate=frame_rate, events=events)
+
     # term.cbreak() makes it so each character can be inputted without
     # pressing the ENTER, using the special term.inkey() method.
-    with term.cbreak(), term.hidden_cursor():
-        while True:
-            time.sleep(0.2)
+    try:
+        with term.cbreak(), term.hidden_cursor():
+            asyncio.run(session.run())
+    finally:
+        # A game that is stopped before it's over gets its end events too.
+        if writer is not None:
+            events.end()
+            writer.close()
+    profiler.export(PROFILE_FILE)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # With --fast, the title screen is skipped and nothing waits.
+    def wait(seconds):
+        if not args.fast:
+            time.sleep(seconds)
+
+    import blessed
+    import snake_audio as sa
+    import terminal_snake as ts
+
+    term = blessed.Terminal()
+    # Blessed is a wrapper around the classic curses
+
+    # term.fullscreen() saves your current console (terminal) screen, and
+    # restores it when you exit.
+    # term.hidden_cursor() hides the cursor.
+    # Sounds are loaded once here, and played without waiting for them.
+    # With --fast they are loaded on another thread while the game starts.
+    # audio.close() is called when the game ends.
+    audio = sa.AudioManager('null' if args.no_sound else 'auto', background=args.fast)
+    with audio, term.fullscreen(), term.hidden_cursor():
+        if not args.fast:
+            print(term.gold + 'SNAKE GAME' + term.normal)
+            audio.play('start')
+            time.sleep(audio.duration('start', 2.7))
+
+            input('Press ENTER to continue...')
+
+        if args.load is not None:
+            length = height = None
+        elif args.length is not None and args.height is not None:
+            length, height = args.length, args.height
+            if length < 3 or height < 3:
+                raise SystemExit('Length and height should be at least three.')
+        else:
+            length, height = ask_size(term, wait)
+
+        wait(1)
+        if not args.fast:
+            print(term.clear + 'Use ARROW keys to move. Press P to pause, S to save...')
+        wait(2)
+        print(term.clear + term.normal)
+        # Prompting and taking the data thus far.
+
+        if args.load is not None:
+            import snake_state as ss
+            game = ss.load(args.load, snake_chars(term))
+        else:
+            game = ts.Game(length, height, snake_chars(term))
+        play(term, audio, game, DIFF_RENDER and not args.full_render, PROFILE or args.profile,
+             args.row_render, args.autopilot, args.tick_rate, args.speed_up, args.frame_rate,
+             args.events)
+
+        # End sound and screen.
+        audio.play('end')
+        wait(2)
+
+        print(term.white_on_firebrick4 + term.clear + 'GAME OVER')
+
+        wait(2)
+        print(f'You have survived {game.steps} steps.')
+        wait(1)
+        print(f'You have eaten {game.f_eaten} fruits')
+
+        wait(1)
+        audio.play('eat')
+        if game.won:
+            print('You won the game!')
+        # This is equal to covering every coordinate over the grid.
+        # Which is, infact, really hard. It's a victory.
+
+        wait(2)
+        input('\nPress ENTER to continue...')
+
 
-            print(term.home, end='')
 
-            # If snake crash, then game over.
-            if snake.out_of_grid(game):
-                break
-            if snake.is_head_tail_crash():
-                break
-            
-            # If there is no space left to move, than also game over.
-            # That it because there might be a bug with the 
-            # fruit spawner, that might cause an infinite loop.
-            # If the spawner tries to spawn a fruit, when there is exactly no space left,
-            # then of course it won't be able find an appropriate place, which will cause the loop.
-            if length*height == ts.GameObject.occupied_number():
-                break
-            
-            # Checks whether the fruit exist or not, and if it does,
-            # if snake is in a position to eat it or not, which is basically
-            # asking if head and fruit are on the same coordinates or not.
-            # Eats the fruit and grows the snake if that is true.
-            if f_list:
-                for fruit in f_list:
-                    if snake.eat_fruit(fruit):
-                        f_eaten += 1
-                        f_list.remove(fruit)
-                        snake.grow_snake()
-                        ps.playsound('eat.mp3', False)
-                        break
-            
-            # Printing the game area, or grid.
-            game.run_grid(s_list, f_list)
-            game.print_grid_list()
-            print(f'{steps} steps x {f_eaten} fruit')
-
-            # Taking the keypress, 0.02 is timeout.
-            keypress = term.inkey(0.02)
-            old_dir = snake.snake_body[0][1]
-
-            # Pauses if keypress is p/P and waits until p/P pressed again.
-            if keypress == 'p' or keypress == 'P':
-                while True:
-                    keypress = term.inkey()
-                    if keypress == 'p' or keypress == 'P':
-                        break
-            elif keypress.name == 'KEY_RIGHT' and old_dir != 'l':
-                new_dir = 'r'
-            elif keypress.name == 'KEY_LEFT' and old_dir != 'r':
-                new_dir = 'l'
-            elif keypress.name == 'KEY_UP' and old_dir != 'd':
-                new_dir = 'u'
-            elif keypress.name == 'KEY_DOWN' and old_dir != 'u':
-                new_dir = 'd'
-            else:
-                new_dir = old_dir
-            # Snake can only turn by 90 degrees. Snake cannot and will not do any 180 turns. 
-            # Pressing any other key except r,l,u,d or not pressing at all before the timeout will
-            # make the snake to keep going to that location.
-
-            snake.move_snake(new_dir)
-            steps += 1
-
-            # Spawn a fruit every 5 steps if there isn't any other fruit.
-            if steps % 5 == 0 and f_list == []:
-                while True:
-                    fruit = game.spawn_fruit()
-
-                    # Fruit's coordinates are randomly chosen.
-                    # So checking them to be sure no intersection will happen.
-                    intersect = ts.GameObject.is_intersect(fruit.coords_list)
-                    if intersect == False:
-                        f_list.append(fruit)
-                        fruit.occupy_space()
-                        break
-    
-    # End sound and screen.
-    ps.playsound('end.mp3', False)
-    time.sleep(2)
-
-    print(term.white_on_firebrick4 + term.clear + 'GAME OVER')
-    
-    time.sleep(2) 
-    print(f'You have survived {steps} steps.')
-    time.sleep(1)
-    print(f'You have eaten {f_eaten} fruits')
-
-    time.sleep(1)
-    ps.playsound('eat.mp3', False)
-    if length*height == ts.GameObject.occupied_number():
-        print('You won the game!')
-    # This is equal to covering every coordinate over the grid.
-    # Which is, infact, really hard. It's a victory.
-    
-    time.sleep(2)
-    input('\nPress ENTER to continue...')
+if __name__ == '__main__':
+    main()
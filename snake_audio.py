@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of the sound of the game.
+Sounds are loaded once, when the game starts, and played without
+blocking the game. There are 3 backends, tried in this order:
+miniaudio, which decodes the sounds to memory and mixes them on its own thread,
+playsound, which plays them on a worker thread,
+and null, which doesn't play anything, for the games without sound.
+"""
+
+
+import os
+import queue
+import threading
+import time
+import warnings
+from array import array
+
+try:
+    with warnings.catch_warnings():
+        # audioop is deprecated since Python 3.12, and removed in 3.13.
+        warnings.simplefilter('ignore', DeprecationWarning)
+        import audioop
+except ImportError:
+    audioop = None
+
+
+SOUNDS = {'start': 'start.mp3', 'eat': 'eat.mp3', 'end': 'end.mp3'}
+# Sounds of the game, by name. Paths are relative to this file.
+
+MERGE_TIME = 0.05
+# If a sound is played again in this many seconds, it is merged with
+# the one playing, instead of playing both. Such as eating two fruits very fast.
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+# Format that all the sounds are decoded to, for miniaudio.
+
+MAX_VOICES = 4
+# Maximum number of sounds playing at the same time. New ones are dropped.
+
+BUFFER_MSEC = 30
+# Length of the buffer of the playback device. A sound starts playing at most
+# about this late, miniaudio's default of 200 ms is a delay one can hear.
+
+
+
+class NullBackend:
+    """
+    Backend that doesn't play anything.
+    """
+    def load(self, name, path):
+        """
+        Loads the sound at path as name. Returns its duration in seconds, None if unknown.
+        """
+        return None
+
+
+    def play(self, name):
+        pass
+
+
+    def close(self):
+        pass
+
+
+
+class PlaysoundBackend:
+    """
+    Backend that plays the sounds with playsound, on a worker thread.
+    playsound can't keep sounds in memory, but at least the game doesn't wait for it.
+    """
+    def __init__(self):
+        import playsound
+        self.playsound = playsound.playsound
+        # playsound is a little library to play mp3 files.
+
+        self.paths = {}
+        self.queue = queue.Queue(MAX_VOICES)
+        self.worker = threading.Thread(target=self.work, name='snake-audio', daemon=True)
+        self.worker.start()
+
+
+    def load(self, name, path):
+        self.paths[name] = path
+        return None
+
+
+    def play(self, name):
+        # If the worker is too far behind, the sound is dropped.
+        try:
+            self.queue.put_nowait(self.paths[name])
+        except queue.Full:
+            pass
+
+
+    def work(self):
+        while True:
+            path = self.queue.get()
+            if path is None:
+                break
+            try:
+                self.playsound(path, True)
+            except Exception:
+                # A sound that can't be played isn't a reason to stop the game.
+                pass
+
+
+    def close(self):
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+
+class MiniaudioBackend:
+    """
+    Backend that decodes the sounds to memory with miniaudio.
+    A playback device mixes the playing sounds on its own thread, so playing a sound
+    is only putting it in a queue.
+    """
+    def __init__(self):
+        import miniaudio
+        self.miniaudio = miniaudio
+
+        self.samples = {}
+        self.queue = queue.SimpleQueue()
+
+        # Device plays silence until a sound is played.
+        self.device = miniaudio.PlaybackDevice(miniaudio.SampleFormat.SIGNED16,
+                                               CHANNELS, SAMPLE_RATE,
+                                               buffersize_msec=BUFFER_MSEC)
+        mixer = self.mix()
+        next(mixer)
+        self.device.start(mixer)
+
+
+    def load(self, name, path):
+        sound = self.miniaudio.decode_file(path, self.miniaudio.SampleFormat.SIGNED16,
+                                           CHANNELS, SAMPLE_RATE)
+        self.samples[name] = sound.samples
+        return sound.duration
+
+
+    def play(self, name):
+        self.queue.put(self.samples[name])
+
+
+    def mix(self):
+        """
+        Generator that the device asks for the next frames.
+        Adds up the samples of the playing sounds.
+        """
+        voices = []
+        # Playing sounds, as [samples, position] lists.
+
+        frames = yield b''
+        while True:
+            while True:
+                try:
+                    samples = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if len(voices) < MAX_VOICES:
+                    voices.append([samples, 0])
+
+            n = frames * CHANNELS
+            if not voices:
+                out = array('h', bytes(n * 2))
+            elif len(voices) == 1:
+                samples, position = voices[0]
+                out = samples[position:position+n]
+            else:
+                out = add_samples([samples[position:position+n] for samples, position in voices], n)
+
+            for voice in voices:
+                voice[1] += n
+            voices = [voice for voice in voices if voice[1] < len(voice[0])]
+
+            # The end of a sound is filled with silence.
+            if len(out) < n:
+                out = out + array('h', bytes((n - len(out)) * 2))
+            frames = yield out
+
+
+    def close(self):
+        self.device.close()
+
+
+
+def add_samples(fragments, n):
+    """
+    Assumes fragments are arrays of 16 bit samples, with at most n samples each.
+    Returns an array of n samples, their sum clipped to 16 bits. Shorter ones
+    are filled with silence. Whole buffers are added at once, by audioop, or by
+    NumPy where audioop is gone, as a loop over the samples takes a lot of the GIL.
+    NumPy is imported on the first mix, not with the game, so it starts faster.
+    """
+    fragments = [fragment + array('h', bytes((n - len(fragment)) * 2)) if len(fragment) < n
+                 else fragment for fragment in fragments]
+    if audioop is not None:
+        out = fragments[0].tobytes()
+        for fragment in fragments[1:]:
+            # audioop.add clips the sums that overflow.
+            out = audioop.add(out, fragment.tobytes(), 2)
+        return array('h', out)
+
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is not None:
+        total = np.zeros(n, dtype=np.int32)
+        for fragment in fragments:
+            total += np.frombuffer(fragment, dtype=np.int16)
+        return array('h', np.clip(total, -32768, 32767).astype(np.int16).tobytes())
+
+    out = array('h', bytes(n * 2))
+    for fragment in fragments:
+        for i, sample in enumerate(fragment):
+            out[i] = max(-32768, min(32767, out[i] + sample))
+    return out
+
+
+
+class AudioManager:
+    """
+    Sounds of the game. Loads them once, and plays them without waiting.
+    """
+    def __init__(self, backend='auto', sounds=SOUNDS, background=False):
+        """
+        backend is one of 'auto', 'miniaudio', 'playsound' and 'null'.
+        'auto' takes the first one that can be imported, in that order.
+        sounds is a dict of sound names and their paths.
+        If background is True, sounds are loaded on another thread, so the game can
+        start at once. Sounds that are played before they are loaded are skipped.
+        """
+        self.backend = NullBackend()
+        self.durations = {}
+        self.ready = threading.Event()
+        # ready is set when the sounds are loaded.
+
+        self.loader = None
+        if background:
+            self.loader = threading.Thread(target=self.load, args=(backend, sounds),
+                                           name='snake-audio-loader', daemon=True)
+            self.loader.start()
+        else:
+            self.load(backend, sounds)
+
+        self.last_played = {}
+        # When each sound was played the last time, for merging.
+
+
+    def load(self, backend, sounds):
+        """
+        Opens the backend and loads the sounds.
+        """
+        backend = open_backend(backend)
+
+        durations = {}
+        folder = os.path.dirname(os.path.abspath(__file__))
+        for name, path in sounds.items():
+            durations[name] = backend.load(name, os.path.join(folder, path))
+
+        self.durations = durations
+        self.backend = backend
+        self.ready.set()
+
+
+    def play(self, name):
+        """
+        Plays the sound with name, without waiting for it.
+        """
+        if not self.ready.is_set():
+            return
+        now = time.monotonic()
+        if now - self.last_played.get(name, -MERGE_TIME) < MERGE_TIME:
+            return
+        self.last_played[name] = now
+        self.backend.play(name)
+
+
+    def duration(self, name, default=None):
+        """
+        Returns the duration of the sound with name in seconds,
+        default if the backend doesn't know it.
+        """
+        duration = self.durations.get(name)
+        return default if duration is None else duration
+
+
+    def close(self):
+        if self.loader is not None:
+            self.loader.join()
+        self.backend.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+def open_backend(name='auto'):
+    """
+    Returns a backend object for name. See AudioManager.
+    """
+    backends = {'miniaudio': MiniaudioBackend, 'playsound': PlaysoundBackend, 'null': NullBackend}
+    if name != 'auto':
+        return backends[name]()
+
+    for name in ('miniaudio', 'playsound'):
+        try:
+            return backends[name]()
+        except Exception:
+            # Not installed, or there isn't any sound device.
+            continue
+    return NullBackend()
@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of an autopilot that plays the game on its own.
+
+It follows a Hamiltonian cycle, a path that visits every coordinate of
+the grid once and comes back to the start. A snake that only follows it
+can never crash, but it is slow. So the autopilot takes shortcuts towards
+the fruit, with a breadth-first search, but only the shortcuts that keep
+the snake safe:
+Going along the cycle from the tail to the head passes every section of
+the snake, and the coordinates from the head to the tail are free. A
+shortcut may only jump ahead on the cycle, and never past the tail, so this
+stays true. Also enough free coordinates are kept in front of the head
+for the sections that are still to grow.
+
+The search is made once for each fruit, backwards from it, and it is used
+until the fruit is eaten. The coordinates the snake passes are only left
+behind, so the distances of the others don't change between the steps.
+
+Grids with odd length and odd height don't have a Hamiltonian cycle.
+On them the autopilot goes to the fruit on the shortest path, if it can
+still reach its tail after eating it, tried on a fork of the game.
+Otherwise it follows its tail. It isn't safe like the cycle.
+
+Run it with:
+    python snake_autopilot.py --length 100 --height 100
+to see how fast it plays.
+"""
+
+
+import argparse
+import time
+import weakref
+from collections import deque
+
+import terminal_snake as ts
+
+
+
+def hamiltonian_cycle(length, height):
+    """
+    Returns the coordinates of a Hamiltonian cycle of a LengthxHeight grid, in order.
+    Returns None if there isn't any, which is when both are odd.
+    """
+    # Goes right on the first row, then zigzags on the other rows without the
+    # first column, and comes back up on the first column.
+    if height % 2 == 0:
+        cycle = [(x, 0) for x in range(length)]
+        for y in range(1, height):
+            xs = range(length-1, 0, -1) if y % 2 == 1 else range(1, length)
+            cycle.extend((x, y) for x in xs)
+        cycle.extend((0, y) for y in range(height-1, 0, -1))
+        return cycle
+
+    # Same thing, turned on its side.
+    if length % 2 == 0:
+        return [(x, y) for y, x in hamiltonian_cycle(height, length)]
+    return None
+
+
+
+class Autopilot:
+    """
+    Chooses the directions of the snake of a terminal_snake.Game.
+    Can be used as a policy, autopilot(game) returns the next direction.
+    """
+    def __init__(self, length, height):
+        """
+        Prepares the autopilot for a LengthxHeight grid.
+        """
+        self.grid_area = (length, height)
+        self.cycle = hamiltonian_cycle(length, height)
+
+        self.index = {}
+        # index stores the place of each coordinate on the cycle.
+        if self.cycle is not None:
+            self.index = {coords: i for i, coords in enumerate(self.cycle)}
+
+        self.fruit = None
+        self.fruit_steps = {}
+        # fruit_steps stores how many moves it takes to reach fruit from the
+        # coordinates ahead of the head, only jumping ahead on the cycle.
+
+        self.path = deque()
+        # The planned path to the fruit, for the grids without a cycle.
+
+        self.searches = 0
+        # Number of searches made, for seeing how much they are reused.
+
+
+    def __call__(self, game):
+        return self.next_dir(game)
+
+
+    def next_dir(self, game):
+        """
+        Assumes game is a terminal_snake.Game object on a grid of the size of the autopilot.
+        Returns the next direction of its snake, one of r,l,u,d.
+        """
+        if self.cycle is None:
+            return self.next_dir_without_cycle(game)
+
+        snake = game.snake
+        coords_list = snake.coords_list
+        head = coords_list[0]
+        tail = coords_list[-1]
+        index = self.index
+        cycle_len = len(self.cycle)
+        head_index = index[head]
+
+        def ahead(coords):
+            # How far coords is ahead of the head on the cycle.
+            return (index[coords] - head_index) % cycle_len
+
+        room = ahead(tail)
+        slack = room - snake.growth
+        # There are room-1 free coordinates from the head to the tail.
+        # slack is how many of them would be left after the snake grows.
+
+        fruit = game.f_list[0].coords_list[0] if game.f_list else None
+        if fruit is None:
+            # Eaten, the next fruit needs a new search even if it's on the same coordinates.
+            self.fruit = None
+        fruit_ahead = None
+        if fruit is not None and fruit in index and ahead(fruit) < room:
+            fruit_ahead = ahead(fruit)
+            if fruit != self.fruit:
+                self.plan(head, fruit)
+
+        length, height = self.grid_area
+        short = snake.snake_len == 2 and not snake.growth
+        # A snake of 2 sections can go anywhere. Its tail is behind its head,
+        # so it can't go back on it.
+        reverse = ts.OPPOSITE_DIRECTIONS[snake.snake_body[0][1]]
+
+        best = None
+        best_key = None
+        for new_dir, (step_x, step_y) in ts.DIRECTION_STEPS.items():
+            if new_dir == reverse:
+                continue
+            coords = (head[0] + step_x, head[1] + step_y)
+            if not (0 <= coords[0] < length and 0 <= coords[1] < height):
+                continue
+
+            jump = ahead(coords)
+            eats = coords == fruit
+            if jump == 1 and coords != tail:
+                # Next coordinate on the cycle is always free.
+                pass
+            elif jump <= room:
+                # After a jump, the ones jumped over are behind the head. The slack
+                # left should be at least 1, so the snake can go on along the cycle.
+                # Tail itself is only safe if it moves away, which this also checks.
+                if slack - (jump - 1) - eats < 1:
+                    continue
+            elif short:
+                # Past the tail. Then the tail is right behind the head on the cycle.
+                if cycle_len - jump - eats < 1:
+                    continue
+            else:
+                continue
+
+            # Closest to the fruit first, then the smallest jump.
+            if fruit_ahead is not None and jump <= fruit_ahead:
+                key = (self.fruit_steps.get(coords, cycle_len), jump)
+            else:
+                key = (cycle_len, jump)
+            if best_key is None or key < best_key:
+                best, best_key = new_dir, key
+
+        if best is None:
+            # It can't happen while the snake is on the cycle. But a snake that
+            # didn't start on it keeps going.
+            return snake.snake_body[0][1]
+        return best
+
+
+    def plan(self, head, fruit):
+        """
+        Finds how many moves it takes to reach fruit, from every coordinate
+        between head and fruit on the cycle, jumping only ahead.
+        The search goes backwards from the fruit.
+        """
+        index = self.index
+        cycle_len = len(self.cycle)
+        head_index = index[head]
+        length, height = self.grid_area
+
+        steps = {fruit: 0}
+        queue = deque([fruit])
+        while queue:
+            coords = queue.popleft()
+            x, y = coords
+            coords_ahead = (index[coords] - head_index) % cycle_len
+            next_steps = steps[coords] + 1
+
+            for new_coords in ((x-1, y), (x+1, y), (x, y-1), (x, y+1)):
+                if new_coords in steps or not (0 <= new_coords[0] < length and 0 <= new_coords[1] < height):
+                    continue
+                # Only the coordinates that come before this one can jump to it.
+                if 0 < (index[new_coords] - head_index) % cycle_len < coords_ahead:
+                    steps[new_coords] = next_steps
+                    queue.append(new_coords)
+
+        self.fruit = fruit
+        self.fruit_steps = steps
+        self.searches += 1
+
+
+    def next_dir_without_cycle(self, game):
+        """
+        Returns the next direction for a grid without a Hamiltonian cycle.
+        Goes to the fruit on the shortest path, if the snake can still reach
+        its tail after eating it. Follows its tail otherwise.
+        """
+        snake = game.snake
+        fruit = game.f_list[0].coords_list[0] if game.f_list else None
+        moves = self.safe_moves(game)
+        if not moves:
+            return snake.snake_body[0][1]
+
+        # Path is planned again only if it's gone or the fruit has changed.
+        # Nothing else moves on the grid, so the rest of a path stays free.
+        path = self.path
+        if fruit != self.fruit or not path:
+            path = self.path = deque()
+            if fruit is not None:
+                new_path = self.find_path(game, snake.coords_list[0], fruit)
+                if new_path and self.is_safe_path(game, new_path):
+                    path = self.path = new_path
+            self.fruit = fruit
+            self.searches += 1
+
+        if path:
+            coords = path.popleft()
+            return next(new_dir for new_dir, move in moves.items() if move == coords)
+        return self.follow_tail(game, moves)
+
+
+    def safe_moves(self, game):
+        """
+        Returns the moves that don't crash at once, as a dict of their
+        directions and coordinates.
+        """
+        snake = game.snake
+        head_x, head_y = snake.coords_list[0]
+        tail = snake.coords_list[-1]
+        length, height = self.grid_area
+        cells = game.grid.occupancy.cells
+        fruits = {fruit.coords_list[0] for fruit in game.f_list}
+        reverse = ts.OPPOSITE_DIRECTIONS[snake.snake_body[0][1]]
+
+        moves = {}
+        for new_dir, (step_x, step_y) in ts.DIRECTION_STEPS.items():
+            coords = (head_x + step_x, head_y + step_y)
+            if new_dir == reverse or not (0 <= coords[0] < length and 0 <= coords[1] < height):
+                continue
+            # The tail moves away, unless the snake is growing.
+            if coords in cells and coords not in fruits and not (coords == tail and not snake.growth):
+                continue
+            moves[new_dir] = coords
+        return moves
+
+
+    def find_path(self, game, start, goal):
+        """
+        Returns the shortest path from start to goal over the free coordinates,
+        without start, as a deque. Empty if there isn't any.
+        The fruits and goal are counted as free.
+        """
+        length, height = self.grid_area
+        cells = game.grid.occupancy.cells
+        fruits = {fruit.coords_list[0] for fruit in game.f_list}
+
+        came_from = {start: None}
+        queue = deque([start])
+        while queue:
+            coords = queue.popleft()
+            if coords == goal:
+                break
+            x, y = coords
+            for new_coords in ((x-1, y), (x+1, y), (x, y-1), (x, y+1)):
+                if new_coords in came_from or not (0 <= new_coords[0] < length and 0 <= new_coords[1] < height):
+                    continue
+                if new_coords in cells and new_coords != goal and new_coords not in fruits:
+                    continue
+                came_from[new_coords] = coords
+                queue.append(new_coords)
+
+        path = deque()
+        if goal not in came_from:
+            return path
+        coords = goal
+        while coords != start:
+            path.appendleft(coords)
+            coords = came_from[coords]
+        return path
+
+
+    def is_safe_path(self, game, path):
+        """
+        Plays path on a fork of game. Returns True if the snake doesn't
+        crash, and can still reach its tail at the end, False otherwise.
+        """
+        future = game.fork()
+        for coords in path:
+            head_x, head_y = future.snake.coords_list[0]
+            new_dir = next(d for d, step in ts.DIRECTION_STEPS.items()
+                           if (head_x + step[0], head_y + step[1]) == coords)
+            if future.step(new_dir):
+                return future.won
+        return self.reaches_tail(future)
+
+
+    def reaches_tail(self, game):
+        """
+        Returns True if the head of the snake can reach its tail, False otherwise.
+        """
+        coords_list = game.snake.coords_list
+        if len(coords_list) < 3:
+            return True
+        return bool(self.find_path(game, coords_list[0], coords_list[-1]))
+
+
+    def follow_tail(self, game, moves):
+        """
+        Returns the move after which the tail can be reached, on the longest way
+        to it, so the snake leaves more room behind. If there isn't any,
+        the move with the most room.
+        """
+        best = None
+        best_length = -1
+        for new_dir in moves:
+            future = game.fork()
+            if future.step(new_dir):
+                if future.won:
+                    return new_dir
+                continue
+            coords_list = future.snake.coords_list
+            path = self.find_path(future, coords_list[0], coords_list[-1])
+            if path and len(path) > best_length:
+                best, best_length = new_dir, len(path)
+        if best is not None:
+            return best
+        return max(moves, key=lambda d: self.room(game, moves[d]))
+
+
+    def room(self, game, start):
+        """
+        Returns the number of free coordinates that can be reached from start.
+        """
+        length, height = self.grid_area
+        cells = game.grid.occupancy.cells
+
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            x, y = queue.popleft()
+            for new_coords in ((x-1, y), (x+1, y), (x, y-1), (x, y+1)):
+                if new_coords in seen or not (0 <= new_coords[0] < length and 0 <= new_coords[1] < height):
+                    continue
+                if new_coords in cells:
+                    continue
+                seen.add(new_coords)
+                queue.append(new_coords)
+        return len(seen)
+
+
+
+AUTOPILOTS = weakref.WeakKeyDictionary()
+# Autopilot of each game played with autopilot_policy.
+
+
+def autopilot_policy(game):
+    """
+    A policy for snake_tournament, that plays with an Autopilot.
+    """
+    autopilot = AUTOPILOTS.get(game)
+    if autopilot is None:
+        autopilot = AUTOPILOTS[game] = Autopilot(*game.grid.grid_area)
+    return autopilot(game)
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plays a game with the autopilot, and times it.')
+    parser.add_argument('--length', type=int, default=100)
+    parser.add_argument('--height', type=int, default=100)
+    parser.add_argument('--steps', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    game = ts.Game(args.length, args.height, seed=args.seed)
+    autopilot = Autopilot(args.length, args.height)
+
+    slowest = 0.0
+    start = time.perf_counter()
+    while not game.over and game.steps < args.steps:
+        move_start = time.perf_counter()
+        new_dir = autopilot(game)
+        slowest = max(slowest, time.perf_counter() - move_start)
+        game.step(new_dir)
+    seconds = time.perf_counter() - start
+
+    print(f'{game.steps} steps in {seconds:.2f} s, {game.steps / seconds:,.0f} steps/s, '
+          f'slowest move took {slowest*1000:.1f} ms')
+    print(f'{game.f_eaten} fruits eaten, {autopilot.searches} searches, '
+          f'crash: {game.crash}, won: {game.won}')
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of a batched version of the game, that plays
+many games at once with NumPy arrays. Rules are the same as terminal_snake.Game.
+"""
+
+
+import random
+
+import numpy as np
+
+import terminal_snake as ts
+
+
+DIRECTIONS = 'rlud'
+# Directions are stored as their index in this string. So r == 0, l == 1, u == 2, d == 3.
+
+STEP_X = np.array([1, -1, 0, 0], dtype=np.int64)
+STEP_Y = np.array([0, 0, -1, 1], dtype=np.int64)
+OPPOSITE = np.array([1, 0, 3, 2], dtype=np.int8)
+# How much x and y change for each direction, and the opposite of each direction.
+
+NO_CRASH, WALL_CRASH, SELF_CRASH = 0, 1, 2
+CRASH_NAMES = {NO_CRASH: None, WALL_CRASH: 'wall', SELF_CRASH: 'self'}
+# Crash reasons, their names are the same as terminal_snake.Game.crash.
+
+
+
+class BatchGame:
+    """
+    N games of the same size, played in lockstep.
+    Boards are stored as arrays, and a step call moves all of them at once.
+    Coordinates are stored as flat indexes, y*length + x.
+    """
+    def __init__(self, n, length, height, seed=None):
+        """
+        Starts n new games on LengthxHeight grids.
+        seed is for the NumPy random generator, that chooses the coordinates.
+        """
+        if length < 3 or height < 3:  # Or there wouldn't be enough space for the snake
+            raise ValueError('Length and height should be greater or equal to 3.')
+        self.n = n
+        self.grid_area = (length, height)
+        self.area = length * height
+        self.rng = np.random.default_rng(seed)
+
+        self.occupied = np.zeros((n, self.area), dtype=bool)
+        # occupied stores which cells are taken by the snake of each game.
+        # Fruit is not in it, it is in fruit.
+
+        self.body = np.zeros((n, self.area), dtype=np.int64)
+        self.body_dirs = np.zeros((n, self.area), dtype=np.int8)
+        # Ring buffers of the sections and their directions. A snake can't be longer
+        # than the area, so they never overflow. Head is at head_index, and the section
+        # before it at head_index-1, wrapping around.
+
+        self.head_index = np.zeros(n, dtype=np.int64)
+        self.head_x = np.zeros(n, dtype=np.int64)
+        self.head_y = np.zeros(n, dtype=np.int64)
+        self.head_dir = np.zeros(n, dtype=np.int8)
+        self.snake_len = np.zeros(n, dtype=np.int64)
+        self.growth = np.zeros(n, dtype=np.int64)
+
+        self.fruit = np.full(n, -1, dtype=np.int64)
+        # Flat index of the fruit of each game, -1 if there isn't any.
+
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.f_eaten = np.zeros(n, dtype=np.int64)
+        self.over = np.zeros(n, dtype=bool)
+        self.won = np.zeros(n, dtype=bool)
+        self.crash = np.zeros(n, dtype=np.int8)
+
+        self.reset(np.ones(n, dtype=bool))
+
+
+    def reset(self, mask):
+        """
+        Assumes mask is a boolean array of length n.
+        Starts new games in the places where mask is True.
+        Snakes are spawned like Grid.spawn_new_snake does.
+        """
+        rows = np.flatnonzero(mask)
+        m = len(rows)
+        length, height = self.grid_area
+
+        head_x = self.rng.integers(1, length-1, size=m)
+        head_y = self.rng.integers(1, height-1, size=m)
+        # Tail is next to the head, and the head looks away from it.
+        head_dir = self.rng.integers(0, 4, size=m).astype(np.int8)
+        tail_x = head_x - STEP_X[head_dir]
+        tail_y = head_y - STEP_Y[head_dir]
+
+        self.occupied[rows] = False
+        self.occupied[rows, head_y*length + head_x] = True
+        self.occupied[rows, tail_y*length + tail_x] = True
+
+        self.body[rows, 0] = tail_y*length + tail_x
+        self.body[rows, 1] = head_y*length + head_x
+        self.body_dirs[rows, 0] = head_dir
+        self.body_dirs[rows, 1] = head_dir
+        self.head_index[rows] = 1
+
+        self.head_x[rows] = head_x
+        self.head_y[rows] = head_y
+        self.head_dir[rows] = head_dir
+        self.snake_len[rows] = 2
+        self.growth[rows] = 0
+        self.fruit[rows] = -1
+        self.steps[rows] = 0
+        self.f_eaten[rows] = 0
+        self.over[rows] = False
+        self.won[rows] = False
+        self.crash[rows] = NO_CRASH
+
+
+    def step(self, actions):
+        """
+        Assumes actions is an array of length n, with direction indexes or -1.
+        Moves every game that isn't over one step, like terminal_snake.Game.step.
+        -1 or a 180 degree turn keeps the direction of the snake.
+        Returns the over array.
+        """
+        rows = np.flatnonzero(~self.over)
+        if not len(rows):
+            return self.over
+        length, height = self.grid_area
+        area = self.area
+
+        # Snake can only turn by 90 degrees.
+        old_dir = self.head_dir[rows]
+        new_dir = np.asarray(actions, dtype=np.int8)[rows]
+        new_dir = np.where((new_dir < 0) | (new_dir == OPPOSITE[old_dir]), old_dir, new_dir)
+
+        head_x = self.head_x[rows] + STEP_X[new_dir]
+        head_y = self.head_y[rows] + STEP_Y[new_dir]
+        wall = (head_x < 0) | (head_x >= length) | (head_y < 0) | (head_y >= height)
+        new_head = np.where(wall, 0, head_y*length + head_x)
+
+        # A growing snake keeps its tail, the others pop it.
+        growing = self.growth[rows] > 0
+        popping = rows[~growing]
+        tail_index = (self.head_index[popping] - self.snake_len[popping] + 1) % area
+        self.occupied[popping, self.body[popping, tail_index]] = False
+        self.growth[rows[growing]] -= 1
+        self.snake_len[rows[growing]] += 1
+
+        head_index = (self.head_index[rows] + 1) % area
+        self.head_index[rows] = head_index
+        self.body[rows, head_index] = new_head
+        self.body_dirs[rows, head_index] = new_dir
+        self.head_x[rows] = head_x
+        self.head_y[rows] = head_y
+        self.head_dir[rows] = new_dir
+
+        # Head on a taken cell is a crash to itself. The wall crashes don't take any cell.
+        inside = rows[~wall]
+        self_crash = np.zeros(len(rows), dtype=bool)
+        self_crash[~wall] = self.occupied[inside, new_head[~wall]]
+        self.occupied[inside, new_head[~wall]] = True
+        self.steps[rows] += 1
+
+        # Spawn a fruit every 5 steps if there isn't any other fruit.
+        spawning = rows[(self.steps[rows] % ts.SPAWN_EVERY == 0) & (self.fruit[rows] < 0)]
+        if len(spawning):
+            self.spawn_fruit(spawning)
+
+        crash = np.where(wall, WALL_CRASH, np.where(self_crash, SELF_CRASH, NO_CRASH))
+        full = self.snake_len[rows] + (self.fruit[rows] >= 0) >= area
+        over = (crash != NO_CRASH) | full
+        self.crash[rows] = crash
+        self.over[rows] = over
+        self.won[rows] = full
+
+        # Eats the fruit and grows the snake, if head and fruit are on the same cell.
+        eating = rows[~over & (self.fruit[rows] == new_head)]
+        self.f_eaten[eating] += 1
+        self.fruit[eating] = -1
+        self.growth[eating] += 1
+
+        return self.over
+
+
+    def spawn_fruit(self, rows):
+        """
+        Assumes rows is an array of game indexes without fruit.
+        Spawns a fruit on a random free cell of each of them, if there is any.
+        """
+        free = ~self.occupied[rows]
+        free_number = free.sum(axis=1)
+        # k-th free cell is chosen, by finding where the count of free cells passes k.
+        k = (self.rng.random(len(rows)) * free_number).astype(np.int64)
+        cells = np.argmax(np.cumsum(free, axis=1) > k[:, None], axis=1)
+        self.fruit[rows] = np.where(free_number > 0, cells, -1)
+
+
+    def put_snake(self, i, snake_body):
+        """
+        Assumes snake_body is in the format of Snake.snake_body, head first.
+        Puts the snake of game i where snake_body is, such as on a terminal_snake.Game.
+        """
+        length = self.grid_area[0]
+        self.occupied[i] = False
+        for k, (coords, sect_dir) in enumerate(reversed(snake_body)):
+            self.body[i, k] = coords[1]*length + coords[0]
+            self.body_dirs[i, k] = DIRECTIONS.index(sect_dir)
+            self.occupied[i, coords[1]*length + coords[0]] = True
+        self.head_index[i] = len(snake_body) - 1
+        self.snake_len[i] = len(snake_body)
+        self.head_x[i], self.head_y[i] = snake_body[0][0]
+        self.head_dir[i] = DIRECTIONS.index(snake_body[0][1])
+
+
+    def snake_body(self, i):
+        """
+        Returns the sections of the snake of game i, head first,
+        in the same format as Snake.snake_body.
+        """
+        length = self.grid_area[0]
+        indexes = (self.head_index[i] - np.arange(self.snake_len[i])) % self.area
+        cells = self.body[i, indexes]
+        dirs = self.body_dirs[i, indexes]
+        return [((int(c % length), int(c // length)), DIRECTIONS[d]) for c, d in zip(cells, dirs)]
+
+
+
+def check_against_reference(n=64, length=8, height=6, steps=300, seed=0):
+    """
+    Plays n games with random moves, both with terminal_snake.Game one by one
+    and with BatchGame at once, and checks that they are the same after every step.
+    Fruits of the batch are put where the reference spawned them,
+    because the two use different random generators.
+    Raises an AssertionError at the first difference.
+    """
+    rng = random.Random(seed)
+    actions = np.full((steps, n), -1, dtype=np.int8)
+    expected = []
+    spawned = {}
+    # spawned stores (game, step) -> fruit cell of the reference, -1 for no space.
+
+    batch = BatchGame(n, length, height, seed)
+    for i in range(n):
+        game = ts.Game(length, height, seed=rng.random())
+
+        # Putting the batch snake where the reference one is.
+        batch.put_snake(i, list(game.snake.snake_body))
+
+        states = []
+        for t in range(steps):
+            if game.over:
+                break
+            action = rng.choice('rlud') if rng.random() < 0.3 else None
+            actions[t, i] = -1 if action is None else DIRECTIONS.index(action)
+            had_fruit = bool(game.f_list)
+            game.step(action)
+            # A fruit can't be eaten on the step it is spawned, so it is still there.
+            if game.steps % ts.SPAWN_EVERY == 0 and not had_fruit:
+                if game.f_list:
+                    coords = game.f_list[0].coords_list[0]
+                    spawned[(i, game.steps)] = coords[1]*length + coords[0]
+                else:
+                    spawned[(i, game.steps)] = -1
+            states.append((list(game.snake.snake_body), game.over, game.f_eaten, game.crash, game.won))
+        expected.append(states)
+
+    def spawn_mirrored(rows):
+        for row in rows:
+            batch.fruit[row] = spawned[(int(row), int(batch.steps[row]))]
+    batch.spawn_fruit = spawn_mirrored
+
+    for t in range(steps):
+        batch.step(actions[t])
+        for i in range(n):
+            if t >= len(expected[i]):
+                continue
+            body, over, f_eaten, crash, won = expected[i][t]
+            assert bool(batch.over[i]) == over, (i, t)
+            assert int(batch.f_eaten[i]) == f_eaten, (i, t)
+            assert CRASH_NAMES[int(batch.crash[i])] == crash, (i, t)
+            assert bool(batch.won[i]) == won, (i, t)
+            if crash != 'wall':
+                assert batch.snake_body(i) == body, (i, t)
+
+
+
+if __name__ == '__main__':
+    check_against_reference()
+    print('BatchGame is the same as terminal_snake.Game.')
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of benchmarks for the hot paths of terminal_snake.py.
+Each operation is measured on grids from 10x10 to 1000x1000, with snakes from
+2 sections to the whole grid. Results are time per operation in nanoseconds
+and memory allocated by one operation, and they can be saved as a baseline
+and compared with it, so slower changes are easy to see.
+
+Every operation gets a new grid, and the snake moves on a Hamiltonian cycle
+of it, so it never leaves the grid or crashes, however many times it moves.
+Each operation is timed REPEATS times, and the fastest one is kept.
+
+The baseline is saved with the repo, so a slower change shows up in review.
+Times are compared relative to a reference operation, timed in turns with the
+others, so a baseline of another machine can be compared too. A change that
+is meant to change the timings saves the baseline again with it:
+    python snake_bench.py               (compare with the baseline)
+    python snake_bench.py --save        (save the results as the baseline)
+    python snake_bench.py --quick       (skip the biggest grid)
+"""
+
+
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import time
+import tracemalloc
+from itertools import cycle
+
+import terminal_snake as ts
+import snake_autopilot
+
+
+SIZES = ((10, 10), (100, 100), (1000, 1000))
+SNAKE_FILLS = (0.0, 0.5, 1.0)
+# Snake lengths as a part of the area. 0 is the shortest snake, with 2 sections.
+# Lengths and heights are even, so the grids have Hamiltonian cycles.
+
+REPEAT_TIME = 0.005
+REPEATS = 20
+MAX_CALLS = 100000
+# Each operation is called for about REPEAT_TIME seconds, at most MAX_CALLS
+# times, and that is done REPEATS times. The fastest time is the result, the
+# others are slower because of the other programs on the machine.
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snake_bench_baseline.json')
+
+REFERENCE = 'reference'
+# Name of the reference operation, see reference.
+
+REGRESSION = 1.25
+# Results that are this many times slower than the baseline are reported as regressions.
+
+MAX_NOISE = 0.25
+NOISY_REGRESSION = 2
+# If the noise of a result, or of its baseline, is more than MAX_NOISE, see measure,
+# the machine was too busy to tell. Such a result that is slower than the limit
+# is reported as inconclusive, unless it is NOISY_REGRESSION times the limit,
+# which noise doesn't explain.
+
+
+
+def snake_path(length, height, sections):
+    """
+    Returns the coordinates of a snake on the Hamiltonian cycle of the grid,
+    head first, and the directions of the cycle from its head on.
+    """
+    cycle = snake_autopilot.hamiltonian_cycle(length, height)
+    directions = []
+    for i, (x, y) in enumerate(cycle):
+        next_x, next_y = cycle[(i+1) % len(cycle)]
+        directions.append(next(d for d, step in ts.DIRECTION_STEPS.items()
+                               if step == (next_x - x, next_y - y)))
+    # Head is the last section on the cycle, it goes on where the cycle goes.
+    return cycle[:sections][::-1], directions[sections-1:] + directions[:sections-1]
+
+
+def make_grid(length, height, fill):
+    """
+    Returns a Grid, a Snake on it, that takes fill part of the grid,
+    and an endless iterator of the moves that keep the snake on its cycle.
+    """
+    grid = ts.Grid(length, height, rng=random.Random(0))
+    sections = max(2, int(length * height * fill))
+    coords, directions = snake_path(length, height, sections)
+    snake = ts.Snake(*coords, occupancy=grid.occupancy)
+    snake.occupy_space()
+    return grid, snake, cycle(directions)
+
+
+def calls_for(operation, max_calls=None):
+    """
+    Returns how many calls of operation take about REPEAT_TIME seconds.
+    operation is called at most max_calls times in total, if it is given.
+    """
+    # The first calls also warm up the caches.
+    operation()
+    start = time.perf_counter_ns()
+    operation()
+    first = time.perf_counter_ns() - start
+
+    calls = int(min(MAX_CALLS, max(1, REPEAT_TIME * 1e9 / max(first, 1))))
+    if max_calls is not None:
+        calls = max(1, min(calls, (max_calls - 3) // REPEATS))
+    return calls
+
+
+def time_calls(operation, calls):
+    """
+    Returns the time of one operation in nanoseconds, over calls calls of it.
+    """
+    # Like timeit, the garbage collector is off while timing, so a collection
+    # doesn't land on one operation and not on the other.
+    gc.disable()
+    try:
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            operation()
+        return (time.perf_counter_ns() - start) / calls
+    finally:
+        gc.enable()
+
+
+def allocated(operation):
+    """
+    Returns the peak of memory one operation allocates in bytes.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    operation()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return max(0, peak - before)
+
+
+def measure(operations):
+    """
+    Assumes operations is a list of (name, operation, max_calls) tuples, see benchmarks,
+    and the last one is the reference operation.
+    Returns the time of one call of each operation in nanoseconds, the fastest
+    of REPEATS, that divided by the fastest time of the reference, the noise,
+    and the peak of memory it allocates in bytes, by name.
+    The repeats take turns, so a slow moment of the machine slows down one
+    repeat of many operations, instead of every repeat of one of them.
+    The noise is how much the time of a repeat divided by the reference
+    of the same turn changes, the upper quartile of that over the lower one.
+    """
+    calls = [calls_for(operation, max_calls) for name, operation, max_calls in operations]
+    times = [[] for _ in operations]
+    for _ in range(REPEATS):
+        for i, (name, operation, max_calls) in enumerate(operations):
+            times[i].append(time_calls(operation, calls[i]))
+
+    results = {}
+    reference_times = times[-1]
+    reference_ns = min(reference_times)
+    for (name, operation, max_calls), op_times in zip(operations[:-1], times):
+        relatives = sorted(ns / max(turn_reference_ns, 1e-9)
+                           for ns, turn_reference_ns in zip(op_times, reference_times))
+        noise = relatives[3*len(relatives) // 4] / max(relatives[len(relatives) // 4], 1e-9) - 1
+        ns = min(op_times)
+        results[name] = (ns, ns / reference_ns, noise, allocated(operation))
+    return results
+
+
+def reference():
+    """
+    An operation that doesn't use terminal_snake, timed in turns with the
+    operations of every grid. See compare.
+    """
+    cells = {}
+    for i in range(64):
+        cells[(i, i)] = cells.get((i, i), 0) + 1
+    return sum(cells.values())
+
+
+def bench_run_grid(length, height, fill):
+    grid, snake, moves = make_grid(length, height, fill)
+    def run_grid():
+        grid.run_grid([snake], [])
+    return run_grid, None
+
+
+def bench_print_grid_list(length, height, fill):
+    grid, snake, moves = make_grid(length, height, fill)
+    grid.run_grid([snake], [])
+    sink = io.StringIO()
+    def print_grid_list():
+        sink.seek(0)
+        sink.truncate()
+        grid.print_grid_list(sink)
+    return print_grid_list, None
+
+
+def bench_move_snake(length, height, fill):
+    grid, snake, moves = make_grid(length, height, fill)
+    def move_snake():
+        snake.move_snake(next(moves))
+    return move_snake, None
+
+
+def bench_grow_snake(length, height, fill):
+    # A growing snake keeps its tail, so it can only grow until its head
+    # is right behind its tail on the cycle.
+    grid, snake, moves = make_grid(length, height, fill)
+    room = length * height - snake.snake_len
+    if room <= REPEATS + 2:
+        return None, 0
+    def grow_snake():
+        snake.grow_snake()
+        snake.move_snake(next(moves))
+    return grow_snake, room
+
+
+def bench_is_intersect(length, height, fill):
+    grid, snake, moves = make_grid(length, height, fill)
+    rng = random.Random(1)
+    coords_lists = cycle([[(rng.randrange(length), rng.randrange(height))] for _ in range(1024)])
+    def is_intersect():
+        grid.is_intersect(next(coords_lists))
+    return is_intersect, None
+
+
+def bench_spawn_fruit(length, height, fill):
+    # The fruit is taken away again, so the grid stays the same.
+    grid, snake, moves = make_grid(length, height, fill)
+    def spawn_fruit():
+        fruit = grid.spawn_fruit()
+        if fruit is not None:
+            fruit.occupy_space()
+            fruit.empty_space()
+    return spawn_fruit, None
+
+
+BENCHMARKS = (('Grid.run_grid', bench_run_grid), ('Grid.print_grid_list', bench_print_grid_list),
+              ('Snake.move_snake', bench_move_snake), ('Snake.grow_snake', bench_grow_snake),
+              ('Grid.is_intersect', bench_is_intersect), ('Grid.spawn_fruit', bench_spawn_fruit))
+# Names of the operations, and the functions that make them on a new grid.
+# Each of them returns the operation and the most times it can be called,
+# None if there is no limit. Every operation is made in its own function,
+# so it keeps its own grid, snake and moves.
+
+
+def benchmarks(length, height, fill):
+    """
+    Returns the operations to measure, by name, each on a new grid with
+    a snake that takes fill part of it. Also the most times each of them can be
+    called, None if there is no limit. Operations that can't be called at all,
+    such as growing a snake that takes the whole grid, are left out.
+    """
+    operations = []
+    for name, bench in BENCHMARKS:
+        operation, max_calls = bench(length, height, fill)
+        if operation is not None:
+            operations.append((name, operation, max_calls))
+    return operations
+
+
+
+def run(sizes=SIZES, fills=SNAKE_FILLS, report=print):
+    """
+    Runs every benchmark. Calls report with a line of text after each of them.
+    Returns the results as a dict of 'operation length x height fill' names
+    and {'ns': ..., 'relative': ..., 'noise': ..., 'bytes': ...} dicts.
+    relative is the time divided by the time of the reference operation,
+    timed in turns with it, see measure.
+    """
+    results = {}
+    for length, height in sizes:
+        for fill in fills:
+            operations = benchmarks(length, height, fill)
+            operations.append((REFERENCE, reference, None))
+            for name, (ns, relative, noise, allocated) in measure(operations).items():
+                key = f'{name} {length}x{height} {fill:.0%}'
+                results[key] = {'ns': round(ns, 1), 'relative': round(relative, 4),
+                                'noise': round(noise, 3), 'bytes': allocated}
+                report(f'{key:<40} {ns:>14,.0f} ns/op  +-{noise:>4.0%} {allocated:>14,} B/op')
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION):
+    """
+    Returns the lines of a comparison of results with baseline,
+    and the number of regressions.
+    and the keys of the regressions and of the inconclusive results.
+    Times relative to the reference operation are compared, so a faster or
+    slower machine, or a busy moment of it, isn't taken for a change of the code.
+    A result is a regression if it is threshold times slower than the baseline.
+    If it is, but it or its baseline is noisier than MAX_NOISE, it is inconclusive,
+    until it is NOISY_REGRESSION times that slow.
+    """
+    lines = []
+    regressions = []
+    inconclusive = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result['relative'] / max(baseline[key]['relative'], 1e-9)
+        noise = max(result['noise'], baseline[key]['noise'])
+        mark = ''
+        if ratio > threshold:
+            if noise > MAX_NOISE and ratio <= threshold * NOISY_REGRESSION:
+                mark = f'  INCONCLUSIVE, +-{noise:.0%} noise'
+                inconclusive.append(key)
+            else:
+                mark = '  REGRESSION'
+                regressions.append(key)
+        lines.append(f'{key:<40} {ratio:>8.2f}x time{mark}')
+    return lines, regressions, inconclusive
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks the hot paths of terminal_snake.py.')
+    parser.add_argument('--quick', action='store_true', help='skip the biggest grid')
+    parser.add_argument('--save', action='store_true', help='save the results as the baseline')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file (default: %(default)s)')
+    parser.add_argument('--threshold', type=float, default=REGRESSION)
+    args = parser.parse_args()
+
+    sizes = SIZES[:-1] if args.quick else SIZES
+    results = run(sizes)
+
+    if args.save:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=1, sort_keys=True)
+            file.write('\n')
+        print(f'Saved the baseline to {args.baseline}.')
+    else:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        lines, regressions, inconclusive = compare(results, baseline, args.threshold)
+        if regressions or inconclusive:
+            # Timed again, to tell a slower change from a slow moment of the machine.
+            # The faster of the two runs is kept for each result.
+            print('\nTiming again, to confirm the regressions:')
+            again = run(sizes)
+            for key, result in again.items():
+                if result['relative'] < results[key]['relative']:
+                    results[key] = result
+            lines, regressions, inconclusive = compare(results, baseline, args.threshold)
+        print('\nCompared with the baseline:')
+        print('\n'.join(lines))
+        print(f'{len(regressions)} regressions, {len(inconclusive)} inconclusive.')
+        raise SystemExit(1 if regressions else 0)
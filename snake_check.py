@@ -0,0 +1,408 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of checks of the rules of the game, for long runs of
+random games. It isn't a test file, it's a harness to run before and after
+changing Snake.move_snake, grow_snake, eat_fruit or the Occupancy.
+
+Games of random sizes are played with random seeded moves. After every
+step, the invariants of the game are checked, see check_invariants.
+Some games are copied with Game.fork and snake_state in the middle,
+and the copies are played with the same moves, they should stay the same.
+A few games of every round are drawn by the renderers of snake_render,
+after a random number of steps like skipped frames, and their frames are
+compared with the game.
+All games are also played on a snake_batch.BatchGame in lockstep, and
+compared step by step. Any other fast engine can be compared the same way.
+
+Run it with:
+    python snake_check.py                         (10^6 steps, about a minute)
+    python snake_check.py --steps 100000 --seed 7
+A failure prints the seed, the round, the game and the step to play it again.
+"""
+
+
+import argparse
+import importlib.util
+import io
+import random
+import time
+from collections import Counter
+
+import terminal_snake as ts
+import snake_autopilot
+import snake_render
+import snake_state
+
+
+GAMES = 128
+# Games played at once in a round, all of the same size.
+
+MIN_SIZE, MAX_SIZE = 3, 24
+# Lengths and heights of the grids are chosen between these.
+
+ROUND_STEPS = 4000
+# A round ends when all of its games are over, or after this many steps.
+
+FULL_CHECK_EVERY = 32
+# The free coordinates and the batch bodies take time by the area and the length,
+# so they are only checked every this many steps, and at game over.
+
+COPY_CHANCE = 0.1
+# Chance of a game to be copied, by Game.fork and snake_state, in the middle.
+
+AUTOPILOT_ROUNDS = 0.2
+AUTOPILOT_SIZES = (4, 6, 8)
+# Chance of a round to be on a small grid, with these even lengths and heights.
+# Random moves never fill a grid, the autopilot does, so wins are checked too.
+
+RENDERERS = (snake_render.DiffRenderer, snake_render.RowRenderer, snake_render.ViewportRenderer)
+# First games of every round are drawn by one of these each.
+
+FRAME_STEPS = 8
+# Rendered games are drawn after 1 to this many steps, so many steps share a frame.
+
+NOT_PLAYED = object()
+# Move of a game that was over before the step, None is a move that keeps the direction.
+
+RISK_CHANCE = 0.002
+# Chance of a move to be any direction, or None, that may crash at once.
+# Other moves are chosen among the ones that don't crash at once, so games get long.
+
+GREED_CHANCE = 0.8
+# Chance of a safe move to be one that gets closer to the fruit, if there is one.
+# So the snakes eat and grow, instead of wandering.
+
+
+
+def random_policy(rng):
+    """
+    Assumes rng is a random.Random object.
+    Returns a policy that plays random moves with it, mostly safe ones
+    that go to the fruit.
+    """
+    def policy(game):
+        if rng.random() < RISK_CHANCE:
+            return rng.choice('rlud') if rng.random() < 0.5 else None
+
+        snake = game.snake
+        head_x, head_y = snake.coords_list[0]
+        old_dir = snake.snake_body[0][1]
+        length, height = game.grid.grid_area
+        cells = game.grid.occupancy.cells
+        fruits = [fruit.coords_list[0] for fruit in game.f_list]
+        tail = snake.coords_list[-1] if not snake.growth else None
+
+        safe = []
+        closer = []
+        for new_dir, (step_x, step_y) in ts.DIRECTION_STEPS.items():
+            coords = (head_x + step_x, head_y + step_y)
+            if (new_dir != ts.OPPOSITE_DIRECTIONS[old_dir]
+                    and 0 <= coords[0] < length and 0 <= coords[1] < height
+                    and (coords not in cells or coords == tail or coords in fruits)):
+                safe.append(new_dir)
+                if fruits and (abs(coords[0] - fruits[0][0]) + abs(coords[1] - fruits[0][1])
+                               < abs(head_x - fruits[0][0]) + abs(head_y - fruits[0][1])):
+                    closer.append(new_dir)
+
+        if closer and rng.random() < GREED_CHANCE:
+            return rng.choice(closer)
+        if safe:
+            return rng.choice(safe)
+        return None
+    return policy
+
+
+def check_invariants(game, full=False):
+    """
+    Assumes game is a terminal_snake.Game object, as it is after a step.
+    Raises an AssertionError if the snake, the fruits and the occupancy
+    don't agree with each other. If full is True, the free coordinates
+    are checked too, which takes time by the area.
+    """
+    snake = game.snake
+    occupancy = game.grid.occupancy
+    length, height = game.grid.grid_area
+    coords_list = snake.coords_list
+    fruits = [fruit.coords_list[0] for fruit in game.f_list]
+
+    # Snake
+    assert snake.snake_len == len(snake.snake_body) == len(coords_list), 'snake_len'
+    assert list(coords_list) == [sect[0] for sect in snake.snake_body], 'coords_list != snake_body'
+    # A section was entered by moving in its direction, so the next one is a step behind it.
+    for (coords, sect_dir), next_coords in zip(snake.snake_body, list(coords_list)[1:]):
+        step_x, step_y = ts.DIRECTION_STEPS[sect_dir]
+        assert next_coords == (coords[0] - step_x, coords[1] - step_y), 'sections not connected'
+    assert snake.snake_len + snake.growth == 2 + game.f_eaten, 'length != eaten fruits'
+
+    # Occupancy
+    assert occupancy.total == snake.snake_len + len(fruits), 'occupancy total'
+    assert occupancy.objects.get(snake.obj_index) is coords_list, 'snake not registered'
+    for fruit in game.f_list:
+        assert occupancy.objects.get(fruit.obj_index) is fruit.coords_list, 'fruit not registered'
+    assert len(occupancy.objects) == 1 + len(fruits), 'unknown objects'
+    assert occupancy.cells == Counter(coords_list) + Counter(fruits), 'occupancy cells'
+
+    # Nothing shares a cell, unless the game is over. Snake crashed into itself,
+    # or filled the grid with its head on the fruit.
+    if not game.over:
+        assert len(occupancy.cells) == occupancy.total, 'duplicate cells'
+    for x, y in fruits:
+        assert 0 <= x < length and 0 <= y < height, 'fruit out of grid'
+
+    # Crash reasons, by the slow checks of Snake.
+    if game.over:
+        if snake.out_of_grid(game.grid):
+            assert game.crash == 'wall', 'wall crash'
+        elif snake.is_head_tail_crash():
+            assert game.crash == 'self', 'self crash'
+        else:
+            assert game.crash is None and game.won and game.grid.is_full(), 'over without a reason'
+    else:
+        assert game.crash is None and not game.won, 'crash of a game that goes on'
+        assert not snake.out_of_grid(game.grid) and not snake.is_head_tail_crash(), 'missed crash'
+
+    if full:
+        taken = Counter(y for x, y in occupancy.cells if 0 <= x < length and 0 <= y < height)
+        assert occupancy.row_free == [length - taken[y] for y in range(height)], 'row_free'
+        assert occupancy.free_number == sum(occupancy.row_free), 'free_number'
+
+
+def game_state(game):
+    """
+    Returns everything that should be the same on two copies of a game.
+    """
+    snake = game.snake
+    return (tuple(snake.snake_body), snake.growth, [f.coords_list[0] for f in game.f_list],
+            game.grid.occupancy.row_free, game.f_eaten, game.steps, game.over, game.won, game.crash)
+
+
+
+class BatchCheck:
+    """
+    Plays a snake_batch.BatchGame in lockstep with the games of a round,
+    and compares them after every step.
+    Fruits of the batch are put where the games spawned them, because the
+    two use different random generators.
+    """
+    def __init__(self, games):
+        """
+        Assumes games is a list of terminal_snake.Game objects of the same size, not started.
+        """
+        import snake_batch
+        self.snake_batch = snake_batch
+
+        length, height = games[0].grid.grid_area
+        self.batch = snake_batch.BatchGame(len(games), length, height)
+        for i, game in enumerate(games):
+            self.batch.put_snake(i, list(game.snake.snake_body))
+        self.spawned = {}
+        # spawned stores the fruit cells the games spawned on this step, by game.
+        self.batch.spawn_fruit = self.spawn_fruit
+
+
+    def spawn_fruit(self, rows):
+        for row in rows:
+            self.batch.fruit[row] = self.spawned.pop(int(row))
+
+
+    def step(self, games, moves, spawned, full=False):
+        """
+        Assumes moves is a list of the moves of games on this step, NOT_PLAYED for
+        the games that were over before it. spawned is a dict of the fruit cells the
+        games spawned on this step, -1 if there was no space.
+        Steps the batch, after the games stepped.
+        Raises an AssertionError at the first difference.
+        """
+        batch = self.batch
+        length = batch.grid_area[0]
+        directions = self.snake_batch.DIRECTIONS
+
+        self.spawned = spawned
+        actions = [-1 if move is None or move is NOT_PLAYED else directions.index(move)
+                   for move in moves]
+        batch.step(actions)
+        assert not self.spawned, f'batch games {list(self.spawned)} did not spawn a fruit'
+
+        heads_x, heads_y = batch.head_x.tolist(), batch.head_y.tolist()
+        lengths, eaten = batch.snake_len.tolist(), batch.f_eaten.tolist()
+        over, won = batch.over.tolist(), batch.won.tolist()
+        crash, fruit = batch.crash.tolist(), batch.fruit.tolist()
+        for i, game in enumerate(games):
+            if moves[i] is NOT_PLAYED:
+                continue
+            snake = game.snake
+            fruit_cell = -1
+            if game.f_list:
+                x, y = game.f_list[0].coords_list[0]
+                fruit_cell = y*length + x
+            expected = (snake.coords_list[0], snake.snake_len, game.f_eaten, game.over,
+                        game.won, game.crash, fruit_cell)
+            actual = ((heads_x[i], heads_y[i]), lengths[i], eaten[i], over[i], won[i],
+                      self.snake_batch.CRASH_NAMES[crash[i]], fruit[i])
+            assert actual == expected, f'batch game {i}: {actual} != {expected}'
+            if (full or game.over) and game.crash != 'wall':
+                assert batch.snake_body(i) == list(snake.snake_body), f'batch body of game {i}'
+
+
+
+def rendered_frame(game):
+    """
+    Returns the symbols of the cells of game that aren't empty, by coordinates,
+    as a renderer should keep them in its frame.
+    """
+    char_dict = game.grid.char_dict
+    frame = {}
+    for snake in game.s_list:
+        head_coords, head_dir = snake.snake_body[0]
+        frame[head_coords] = char_dict['head_'+head_dir]
+        for coords, sect_dir in list(snake.snake_body)[1:]:
+            frame.setdefault(coords, char_dict['tail_'+sect_dir])
+    for fruit in game.f_list:
+        frame[fruit.coords_list[0]] = char_dict['fruit']
+    return frame
+
+
+def make_renderer(game, renderer_class):
+    """
+    Returns a renderer of renderer_class for game, that writes to a StringIO.
+    ViewportRenderer gets a viewport smaller than the grid, so it moves.
+    """
+    stream = io.StringIO()
+    if renderer_class is snake_render.ViewportRenderer:
+        length, height = game.grid.grid_area
+        return renderer_class(game.grid, stream=stream, view_size=(length//2 + 1, height//2 + 1),
+                              minimap_width=max(1, length//3))
+    return renderer_class(game.grid, stream=stream)
+
+
+def check_render(game, renderer):
+    """
+    Draws a frame of game with renderer. Raises an AssertionError if the frame
+    it keeps isn't the game.
+    """
+    renderer.stream.seek(0)
+    renderer.stream.truncate()
+    renderer.render(game.s_list, game.f_list)
+    assert renderer.frame == rendered_frame(game), f'{type(renderer).__name__} frame differs'
+
+
+def play_round(rng, games_number, max_steps, batch=True):
+    """
+    Plays a round of games_number random games of a random size, checking them
+    after every step. Some rounds are on small grids, where half of the games
+    are played by snake_autopilot, so they fill the grid and win.
+    Returns the number of steps played, and the list of the games.
+    Raises an AssertionError with the game and the step at the first failure.
+    """
+    if rng.random() < AUTOPILOT_ROUNDS:
+        length, height = rng.choice(AUTOPILOT_SIZES), rng.choice(AUTOPILOT_SIZES)
+        autopilots = games_number // 2
+    else:
+        length, height = rng.randint(MIN_SIZE, MAX_SIZE), rng.randint(MIN_SIZE, MAX_SIZE)
+        autopilots = 0
+    games = [ts.Game(length, height, seed=rng.random()) for _ in range(games_number)]
+    policies = ([snake_autopilot.Autopilot(length, height) for _ in range(autopilots)]
+                + [random_policy(random.Random(rng.random())) for _ in games[autopilots:]])
+    copy_at = [rng.randint(1, length*height) if rng.random() < COPY_CHANCE else None for _ in games]
+    copies = [[] for _ in games]
+    checker = BatchCheck(games) if batch else None
+    renderers = {i: make_renderer(games[i], renderer_class)
+                 for i, renderer_class in enumerate(RENDERERS[:len(games)])}
+    frame_at = {i: 1 for i in renderers}
+
+    steps = 0
+    for step in range(1, max_steps+1):
+        moves = [NOT_PLAYED] * len(games)
+        spawned = {}
+        for i, game in enumerate(games):
+            if game.over:
+                continue
+            move = policies[i](game)
+            moves[i] = move
+            had_fruit = bool(game.f_list)
+            try:
+                game.step(move)
+                if not had_fruit and game.steps % ts.SPAWN_EVERY == 0:
+                    # A new fruit can't be eaten on the step it's spawned, so it's still there.
+                    spawned[i] = -1
+                    if game.f_list:
+                        x, y = game.f_list[0].coords_list[0]
+                        spawned[i] = y*length + x
+                check_invariants(game, full=game.over or step % FULL_CHECK_EVERY == 0)
+
+                for copy in copies[i]:
+                    copy.step(move)
+                    assert game_state(copy) == game_state(game), 'copy differs'
+                if step == copy_at[i] and not game.over:
+                    copies[i] = [game.fork(), snake_state.from_bytes(snake_state.to_bytes(game))]
+                # A crashed snake isn't drawn the same by every renderer, so only the games
+                # that go on are compared.
+                if step == frame_at.get(i) and not game.over:
+                    check_render(game, renderers[i])
+                    frame_at[i] = step + rng.randint(1, FRAME_STEPS)
+            except AssertionError as error:
+                raise AssertionError(f'{length}x{height} game {i}, step {game.steps}: {error}') from None
+            steps += 1
+
+        if checker is not None:
+            try:
+                checker.step(games, moves, spawned, full=step % FULL_CHECK_EVERY == 0)
+            except AssertionError as error:
+                raise AssertionError(f'{length}x{height} step {step}: {error}') from None
+        if all(game.over for game in games):
+            break
+    return steps, games
+
+
+
+def check(total_steps, seed=0, games_number=GAMES, batch=True, log=print):
+    """
+    Plays rounds until total_steps steps are played and checked.
+    Returns a dict of the numbers of steps, games, crashes and wins.
+    """
+    rng = random.Random(seed)
+    stats = {'steps': 0, 'games': 0, 'wall': 0, 'self': 0, 'won': 0, 'unfinished': 0}
+    round_number = 0
+    start = time.perf_counter()
+
+    while stats['steps'] < total_steps:
+        try:
+            steps, games = play_round(rng, games_number, ROUND_STEPS, batch)
+        except AssertionError as error:
+            raise AssertionError(f'seed {seed}, round {round_number}: {error}') from None
+        round_number += 1
+        stats['steps'] += steps
+        stats['games'] += len(games)
+        for game in games:
+            if game.crash is not None:
+                stats[game.crash] += 1
+            elif game.won:
+                stats['won'] += 1
+            else:
+                stats['unfinished'] += 1
+        seconds = time.perf_counter() - start
+        log(f'{stats["steps"]:,} steps checked, {stats["steps"]/seconds:,.0f} steps/s', end='\r')
+    log()
+    return stats
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Checks the rules of the game on many random games.')
+    parser.add_argument('--steps', type=int, default=10**6)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--games', type=int, default=GAMES, help='games played at once')
+    parser.add_argument('--no-batch', action='store_true', help="don't compare with snake_batch")
+    args = parser.parse_args()
+
+    batch = not args.no_batch
+    if batch:
+        if importlib.util.find_spec('numpy') is None:
+            print('NumPy is not installed, snake_batch is not compared.')
+            batch = False
+
+    start = time.perf_counter()
+    stats = check(args.steps, args.seed, args.games, batch)
+    print(f'{stats["steps"]:,} steps of {stats["games"]:,} games checked in '
+          f'{time.perf_counter() - start:.1f} s: {stats["wall"]} wall crashes, '
+          f'{stats["self"]} self crashes, {stats["won"]} won, {stats["unfinished"]} unfinished.')
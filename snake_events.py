@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of a stream of the events of games, and writers that
+save them for analysis. Such as where the snakes crash, how long it takes
+to reach the fruits and how many steps the games last.
+
+An event is a tuple of 6 integers:
+    (game, step, kind, x, y, value)
+game is the number of the game, such as its seed. kind is the index of
+its name in KINDS. x and y are the coordinates of the head, or the fruit.
+value depends on the kind:
+    start   x and y are the length and the height of the grid
+    move    index of the direction in DIRECTIONS
+    spawn   0
+    eat     steps since the fruit was spawned
+    crash   index of the reason in CRASHES
+    win     0
+    end     number of fruits eaten, the step is the number of steps
+
+Events are made while the game is played, by an EventStream that
+snake_loop.Session gives every step, and the writers keep only a batch
+of them in memory. main.py writes the events of a game with --events,
+and game_events plays headless games on the same Session.
+
+Run it with:
+    python snake_events.py play --games 1000 --out events.snkc      (save as columns)
+    python snake_events.py play --games 1000 --out events.ndjson    (save as JSON lines)
+    python snake_events.py summary events.snkc
+"""
+
+
+import argparse
+import json
+import struct
+import sys
+from array import array
+from itertools import chain, islice
+
+import terminal_snake as ts
+import snake_loop
+import snake_tournament
+from snake_replay import CRASHES
+
+
+KINDS = ('start', 'move', 'spawn', 'eat', 'crash', 'win', 'end')
+START, MOVE, SPAWN, EAT, CRASH, WIN, END = range(len(KINDS))
+
+DIRECTIONS = 'rlud'
+DIRECTION_CODES = {new_dir: i for i, new_dir in enumerate(DIRECTIONS)}
+
+BATCH_SIZE = 65536
+# Events are written every this many events.
+
+MAGIC = b'SNKC'
+CHUNK = struct.Struct('<4sI')
+# magic and the number of events of a chunk of the columnar file.
+
+COLUMNS = (('game', 'Q'), ('step', 'I'), ('kind', 'B'), ('x', 'i'), ('y', 'i'), ('value', 'q'))
+# Names and array types of the columns. A chunk is its header, and then
+# every column one after another, in little endian.
+
+
+
+class EventStream:
+    """
+    Makes the events of a game while it is played, and passes each of them
+    to on_event. Such as EventWriter.write, or list.append.
+    snake_loop.Session calls step after every step of the game.
+    """
+    def __init__(self, game, on_event, game_number=0, moves=True):
+        """
+        Assumes game is a terminal_snake.Game object, not played yet.
+        Passes its start event to on_event at once.
+        Move events are left out if moves is False.
+        """
+        self.game = game
+        self.on_event = on_event
+        self.game_number = game_number
+        self.moves = moves
+
+        self.fruit = None
+        self.spawned_at = 0
+        self.f_eaten = game.f_eaten
+        self.ended = False
+        # fruit is the last fruit seen, and spawned_at the step it was spawned on.
+
+        length, height = game.grid.grid_area
+        on_event((game_number, game.steps, START, length, height, 0))
+
+
+    def step(self):
+        """
+        Passes the events of the last step of the game, and its end events if it is over.
+        """
+        game = self.game
+        step = game.steps
+        head_x, head_y = game.snake.coords_list[0]
+
+        if self.moves:
+            self.on_event((self.game_number, step, MOVE, head_x, head_y,
+                           DIRECTION_CODES[game.snake.snake_body[0][1]]))
+
+        # A fruit is eaten, or spawned, or none of them. Never both on the same step.
+        if game.f_eaten != self.f_eaten:
+            self.f_eaten = game.f_eaten
+            self.fruit = None
+            self.on_event((self.game_number, step, EAT, head_x, head_y, step - self.spawned_at))
+        elif game.f_list and game.f_list[0] is not self.fruit:
+            self.fruit = game.f_list[0]
+            self.spawned_at = step
+            fruit_x, fruit_y = self.fruit.coords_list[0]
+            self.on_event((self.game_number, step, SPAWN, fruit_x, fruit_y, 0))
+
+        if game.over:
+            self.end()
+
+
+    def end(self):
+        """
+        Passes the end events of the game, once. Such as when it is over,
+        or when it is stopped before.
+        """
+        if self.ended:
+            return
+        self.ended = True
+        game = self.game
+        head_x, head_y = game.snake.coords_list[0]
+        if game.crash is not None:
+            self.on_event((self.game_number, game.steps, CRASH, head_x, head_y,
+                           CRASHES.index(game.crash)))
+        if game.won:
+            self.on_event((self.game_number, game.steps, WIN, head_x, head_y, 0))
+        self.on_event((self.game_number, game.steps, END, head_x, head_y, game.f_eaten))
+
+
+
+def game_events(game, policy, game_number=0, max_steps=None, moves=True):
+    """
+    Assumes game is a terminal_snake.Game object.
+    Plays it with policy on a snake_loop.Session, without waiting, until it's
+    over or max_steps steps are played,
+    (length*height) * snake_tournament.MAX_STEPS_PER_CELL if None.
+    Yields its events. Move events are left out if moves is False.
+    """
+    length, height = game.grid.grid_area
+    if max_steps is None:
+        max_steps = length * height * snake_tournament.MAX_STEPS_PER_CELL
+
+    # Events of each step are yielded before the next step, so only a few are kept.
+    events = []
+    stream = EventStream(game, events.append, game_number, moves)
+    session = snake_loop.Session(game, policy=policy, events=stream)
+    while True:
+        yield from events
+        events.clear()
+        if game.over or game.steps >= max_steps:
+            break
+        session.step()
+
+    stream.end()
+    yield from events
+
+
+def play_events(policy, seeds, length, height, max_steps=None, moves=True):
+    """
+    Plays a game of LengthxHeight for every seed in seeds, one after another.
+    Yields their events, with their seeds as their game numbers.
+    """
+    return chain.from_iterable(
+        game_events(ts.Game(length, height, seed=seed), policy, seed, max_steps, moves)
+        for seed in seeds)
+
+
+def event_dict(event):
+    """
+    Returns event as a dict, with the names of its kind, direction and crash reason.
+    """
+    game, step, kind, x, y, value = event
+    name = KINDS[kind]
+    if kind == MOVE:
+        value = DIRECTIONS[value]
+    elif kind == CRASH:
+        value = CRASHES[value]
+    return {'game': game, 'step': step, 'kind': name, 'x': x, 'y': y, 'value': value}
+
+
+
+class EventWriter:
+    """
+    Parent of the writers. Keeps a batch of events, and writes them
+    when there are batch_size of them, or when closed.
+    """
+    mode = 'wb'
+
+    def __init__(self, path, batch_size=BATCH_SIZE, append=True):
+        """
+        Opens the file at path. Events are added to its end if append is True,
+        and it is emptied otherwise.
+        """
+        self.file = open(path, self.mode.replace('w', 'a') if append else self.mode)
+        self.batch_size = batch_size
+        self.events = []
+        self.written = 0
+
+
+    def write(self, event):
+        # Only a list append for most events, the batch is turned into lines
+        # or columns at once when it's written.
+        self.events.append(event)
+        if len(self.events) >= self.batch_size:
+            self.flush()
+
+
+    def write_all(self, events):
+        """
+        Writes every event of the iterable events. Returns the number of them.
+        """
+        count = 0
+        events = iter(events)
+        while True:
+            batch = list(islice(events, self.batch_size - len(self.events)))
+            if not batch:
+                return count
+            self.events.extend(batch)
+            count += len(batch)
+            if len(self.events) >= self.batch_size:
+                self.flush()
+
+
+    def flush(self):
+        if self.events:
+            self.write_batch(self.events)
+            self.written += len(self.events)
+            self.events = []
+        self.file.flush()
+
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+class NDJSONWriter(EventWriter):
+    """
+    Writes the events as JSON objects, one on each line. See event_dict.
+    """
+    mode = 'w'
+
+    def write_batch(self, events):
+        dumps = json.JSONEncoder(separators=(',', ':')).encode
+        lines = [dumps(event_dict(event)) for event in events]
+        lines.append('')
+        self.file.write('\n'.join(lines))
+
+
+
+class ColumnarWriter(EventWriter):
+    """
+    Writes the events in chunks, as a column for each field. Chunks are only
+    added to the end of the file, so a file can be written in many runs.
+    See read_columnar.
+    """
+    def write_batch(self, events):
+        self.file.write(CHUNK.pack(MAGIC, len(events)))
+        for (name, type_code), column in zip(COLUMNS, zip(*events)):
+            column = array(type_code, column)
+            if sys.byteorder == 'big':
+                column.byteswap()
+            self.file.write(column.tobytes())
+
+
+
+def writer_for(path, batch_size=BATCH_SIZE, append=True):
+    """
+    Returns an NDJSONWriter if path ends with .ndjson or .jsonl, a ColumnarWriter otherwise.
+    """
+    if path.endswith(('.ndjson', '.jsonl')):
+        return NDJSONWriter(path, batch_size, append)
+    return ColumnarWriter(path, batch_size, append)
+
+
+def read_columnar(path):
+    """
+    Yields the chunks of a columnar file, as dicts of column names and arrays.
+    Raises a ValueError if the file isn't a columnar file.
+    """
+    with open(path, 'rb') as file:
+        while True:
+            header = file.read(CHUNK.size)
+            if not header:
+                break
+            if len(header) < CHUNK.size:
+                raise ValueError('Chunk is cut short.')
+            magic, rows = CHUNK.unpack(header)
+            if magic != MAGIC:
+                raise ValueError('Not a columnar event file.')
+
+            chunk = {}
+            for name, type_code in COLUMNS:
+                column = array(type_code)
+                data = file.read(rows * column.itemsize)
+                if len(data) < rows * column.itemsize:
+                    raise ValueError('Chunk is cut short.')
+                column.frombytes(data)
+                if sys.byteorder == 'big':
+                    column.byteswap()
+                chunk[name] = column
+            yield chunk
+
+
+def summary(path):
+    """
+    Returns a few lines about the games of a columnar file. Such as why and where
+    the snakes crash, how long the fruits take and how long the games last.
+    """
+    crashes = {reason: 0 for reason in CRASHES[1:]}
+    crash_places = {}
+    eats = 0
+    eat_steps = 0
+    game_steps = []
+    wins = 0
+
+    for chunk in read_columnar(path):
+        kinds, values = chunk['kind'], chunk['value']
+        xs, ys, steps = chunk['x'], chunk['y'], chunk['step']
+        for i, kind in enumerate(kinds):
+            if kind == EAT:
+                eats += 1
+                eat_steps += values[i]
+            elif kind == CRASH:
+                crashes[CRASHES[values[i]]] += 1
+                coords = (xs[i], ys[i])
+                crash_places[coords] = crash_places.get(coords, 0) + 1
+            elif kind == WIN:
+                wins += 1
+            elif kind == END:
+                game_steps.append(steps[i])
+
+    game_steps.sort()
+    games = len(game_steps)
+    lines = [f'{games} games, {wins} won, crashes: '
+             + ', '.join(f'{number} {reason}' for reason, number in crashes.items())]
+    if games:
+        p = {q: game_steps[min(games-1, games*q // 100)] for q in (50, 90, 99)}
+        lines.append(f'Steps per game p50/p90/p99: {p[50]}/{p[90]}/{p[99]}, max {game_steps[-1]}')
+    if eats:
+        lines.append(f'{eats} fruits eaten, {eat_steps/eats:.1f} steps from spawning to eating')
+    if crash_places:
+        most = sorted(crash_places.items(), key=lambda item: -item[1])[:5]
+        lines.append('Most crashed coordinates: ' + ', '.join(f'{coords} {n}' for coords, n in most))
+    return '\n'.join(lines)
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Saves the events of many games, or sums them up.')
+    parser.add_argument('mode', choices=('play', 'summary'))
+    parser.add_argument('path', nargs='?', help='columnar file to sum up')
+    parser.add_argument('--out', default='events.snkc',
+                        help='file to write, JSON lines if it ends with .ndjson (default: %(default)s)')
+    parser.add_argument('--policy', default='snake_tournament:greedy_policy')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--length', type=int, default=20)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--max-steps', type=int, default=None)
+    parser.add_argument('--no-moves', action='store_true', help='leave out the move events')
+    args = parser.parse_args()
+
+    if args.mode == 'summary':
+        print(summary(args.path or args.out))
+    else:
+        policy = snake_tournament.load_policy(args.policy)
+        seeds = range(args.first_seed, args.first_seed + args.games)
+        with writer_for(args.out) as writer:
+            events = play_events(policy, seeds, args.length, args.height,
+                                 args.max_steps, not args.no_moves)
+            count = writer.write_all(events)
+        print(f'{count:,} events of {args.games} games written to {args.out}.')
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of an asyncio game loop.
+Reading the keys, moving the game and drawing it are separated. Game moves
+at a fixed timestep, and when there isn't enough time, frames are skipped
+instead of slowing the game down. Many sessions can run on the same loop.
+Ticks can get shorter as the snake eats, and frames can be drawn less often
+than the ticks, so many steps share one frame.
+Keys are read on a thread, and turns wait in a short queue, so every
+key pressed between two steps is used, one turn a step.
+"""
+
+
+import asyncio
+import threading
+
+import snake_profile
+import terminal_snake as ts
+
+
+KEY_DIRECTIONS = {'KEY_RIGHT': 'r', 'KEY_LEFT': 'l', 'KEY_UP': 'u', 'KEY_DOWN': 'd'}
+# Arrow keys and the directions they turn the snake to.
+
+PAUSE_KEYS = ('p', 'P')
+SAVE_KEYS = ('s', 'S')
+
+TURN_QUEUE_SIZE = 3
+# At most this many turns wait for their steps. More are ignored,
+# so the snake doesn't go on turning long after the keys are let go.
+
+MIN_TICK = 1 / 240
+# Ticks don't get shorter than this, however many fruits are eaten.
+
+MAX_CATCH_UP = 5
+# If the loop is late, at most this many ticks are played at once to catch up.
+# If it is still late after them, the lost time is given up on.
+
+
+
+def key_name(key):
+    """
+    Returns the name of a key, such as 'KEY_UP' or 'p'.
+    key is a blessed Keystroke or a string.
+    """
+    return getattr(key, 'name', None) or str(key)
+
+
+class TurnQueue:
+    """
+    Turns waiting for their steps, one is used a step.
+    A turn is checked against the turn before it, instead of the direction
+    of the snake at the time of the key. So a quick UP then LEFT while
+    going right turns the snake up, then left, instead of losing a turn.
+    """
+    def __init__(self, size=TURN_QUEUE_SIZE):
+        self.size = size
+        self.turns = []
+
+
+    def push(self, new_dir, old_dir):
+        """
+        Assumes new_dir and old_dir are r,l,u or d. old_dir is the direction
+        of the snake now. Adds new_dir after the queued turns.
+        Ignores it if the queue is full, or if it keeps the direction of
+        the turn before it, or turns 180 degrees from it.
+        Returns True if new_dir is added, False otherwise.
+        """
+        last_dir = self.turns[-1] if self.turns else old_dir
+        if (len(self.turns) >= self.size or new_dir == last_dir
+                or new_dir == ts.OPPOSITE_DIRECTIONS[last_dir]):
+            return False
+        self.turns.append(new_dir)
+        return True
+
+
+    def pop(self):
+        """
+        Returns the next turn and removes it, or None if there isn't one.
+        """
+        return self.turns.pop(0) if self.turns else None
+
+
+    def clear(self):
+        self.turns.clear()
+
+
+    def __len__(self):
+        return len(self.turns)
+
+
+
+class TerminalKeyReader:
+    """
+    Reads the keys of a terminal on a thread, until it is closed.
+    Every key waiting is read at once, and handed to the asyncio loop.
+    Called, it is an async function that waits for a key and returns it,
+    like the read_key of Session.
+    """
+    def __init__(self, term, timeout=0.05):
+        """
+        Assumes term is a blessed.Terminal, in cbreak mode while reading.
+        timeout is how long term.inkey waits, and how late close can stop the thread.
+        """
+        self.term = term
+        self.timeout = timeout
+        self.keys = None
+        self.loop = None
+        self.thread = None
+        self.stopped = threading.Event()
+        # keys is an asyncio.Queue of the read keys, on the loop of the first call.
+
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.keys = asyncio.Queue()
+        self.thread = threading.Thread(target=self.read_keys, daemon=True)
+        self.thread.start()
+
+
+    def read_keys(self):
+        """
+        Reads the keys until closed. Runs on the thread.
+        """
+        term = self.term
+        while not self.stopped.is_set():
+            key = term.inkey(self.timeout)
+            keys = []
+            while key:
+                keys.append(key)
+                key = term.inkey(0)
+            if keys:
+                try:
+                    self.loop.call_soon_threadsafe(self.put_keys, keys)
+                except RuntimeError:
+                    # Loop is closed.
+                    break
+
+
+    def put_keys(self, keys):
+        for key in keys:
+            self.keys.put_nowait(key)
+
+
+    async def __call__(self):
+        if self.thread is None:
+            self.start()
+        return await self.keys.get()
+
+
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(self.timeout * 4)
+
+
+
+def terminal_key_reader(term, timeout=0.05):
+    """
+    Assumes term is a blessed.Terminal, in cbreak mode while reading.
+    Returns a TerminalKeyReader of it.
+    """
+    return TerminalKeyReader(term, timeout)
+
+
+
+class Session:
+    """
+    A game, its input and its output, played on the asyncio loop.
+    """
+    def __init__(self, game, read_key=None, render=None, tick=0.2, on_eat=None, profiler=None,
+                 on_step=None, on_save=None, policy=None, speed_up=0.0, frame_rate=None,
+                 events=None):
+        """
+        Assumes game is a terminal_snake.Game object.
+        read_key is an async function that returns a key or None, see terminal_key_reader.
+        render is a function that draws the game, it is called with the session.
+        on_eat is called with the session after the snake eats a fruit.
+        on_step is called with the session after every step, drawn or not.
+        on_save is called with the session when S is pressed. None ignores S.
+        policy is a function that takes the game, and returns what its step takes
+        as the next move. If it's given, it moves the snake instead of the keys.
+        tick is the time of a step in seconds. It gets speed_up times shorter
+        for each fruit eaten, such as 0.05 for 5%, down to MIN_TICK.
+        frame_rate is how many frames are drawn at most in a second. If it's None,
+        a frame is drawn after every tick, when there is time for it.
+        profiler is a snake_profile.FrameProfiler that times the phases, or None.
+        events is a snake_events.EventStream of the game, that is given every step,
+        or None. It passes the events of the game to its on_event.
+        Raises a ValueError if tick or frame_rate isn't greater than 0, or speed_up
+        isn't at least 0 and less than 1.
+        """
+        # Written so that nan isn't let in either.
+        if not tick > 0:
+            raise ValueError('tick should be greater than 0.')
+        if frame_rate is not None and not frame_rate > 0:
+            raise ValueError('frame_rate should be greater than 0.')
+        if not 0 <= speed_up < 1:
+            raise ValueError('speed_up should be at least 0 and less than 1.')
+
+        self.game = game
+        self.read_key = read_key
+        self.render = render
+        self.tick = tick
+        self.speed_up = speed_up
+        self.frame_time = None if frame_rate is None else 1 / frame_rate
+        self.on_eat = on_eat
+        self.on_step = on_step
+        self.on_save = on_save
+        self.policy = policy
+        self.events = events
+        self.profiler = snake_profile.NULL_PROFILER if profiler is None else profiler
+
+        self.turns = TurnQueue()
+        # Turns of the pressed arrow keys, until the next steps use them.
+
+        self.paused = False
+        self.resumed = None
+        # resumed is an asyncio.Event that is set when the game isn't paused.
+        # It is created by run, on the loop it runs on.
+
+        self.frames = 0
+        self.skipped_frames = 0
+        self.late_ticks = 0
+        # late_ticks is the number of ticks that were given up on,
+        # because the loop couldn't catch up with them.
+
+
+    def tick_time(self):
+        """
+        Returns the time of the next step in seconds.
+        """
+        if not self.speed_up:
+            return self.tick
+        return max(MIN_TICK, self.tick * (1 - self.speed_up) ** self.game.f_eaten)
+
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+        if self.resumed is not None:
+            if self.paused:
+                self.resumed.clear()
+            else:
+                self.resumed.set()
+
+
+    def handle_key(self, key):
+        """
+        Turns the snake, pauses or saves the game, according to key.
+        """
+        name = key_name(key)
+        if name in PAUSE_KEYS:
+            self.toggle_pause()
+        elif name in SAVE_KEYS:
+            if self.on_save is not None:
+                self.on_save(self)
+        elif name in KEY_DIRECTIONS:
+            self.turns.push(KEY_DIRECTIONS[name], self.game.snake.snake_body[0][1])
+
+
+    async def read_input(self):
+        """
+        Reads the keys until the session is cancelled.
+        """
+        while True:
+            key = await self.read_key()
+            if key is not None:
+                with self.profiler.phase('input'):
+                    self.handle_key(key)
+
+
+    def step(self):
+        """
+        Moves the game one step, with the next turn in the queue.
+        """
+        game = self.game
+        f_eaten = game.f_eaten
+        new_dir = self.turns.pop()
+        if self.policy is not None:
+            with self.profiler.phase('policy'):
+                new_dir = self.policy(game)
+
+        with self.profiler.phase('sim'):
+            game.step(new_dir)
+        if self.events is not None:
+            self.events.step()
+        if game.f_eaten > f_eaten and self.on_eat is not None:
+            self.on_eat(self)
+        if self.on_step is not None:
+            self.on_step(self)
+
+
+    def draw(self):
+        if self.render is not None:
+            with self.profiler.phase('frame'):
+                self.render(self)
+        self.frames += 1
+
+
+    async def run(self):
+        """
+        Plays the game until it is over. Returns the Game object.
+        """
+        loop = asyncio.get_running_loop()
+        game = self.game
+        self.resumed = asyncio.Event()
+        if not self.paused:
+            self.resumed.set()
+        input_task = None
+        if self.read_key is not None:
+            input_task = asyncio.ensure_future(self.read_input())
+
+        try:
+            self.draw()
+            next_tick = loop.time() + self.tick_time()
+            next_frame = loop.time()
+            # Ticks are scheduled on fixed times, instead of waiting tick after
+            # each step. So the time spent drawing doesn't add up.
+            # Frames too, if there is a frame_rate.
+
+            while not game.over:
+                delay = next_tick - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                if self.paused:
+                    await self.resumed.wait()
+                    next_tick = loop.time() + self.tick_time()
+                    continue
+
+                # Playing every tick that is due, but not too many at once.
+                ticks = 0
+                while next_tick <= loop.time() and not game.over:
+                    tick = self.tick_time()
+                    if ticks == MAX_CATCH_UP:
+                        self.late_ticks += int((loop.time() - next_tick) / tick) + 1
+                        next_tick = loop.time() + tick
+                        break
+                    self.step()
+                    next_tick += tick
+                    ticks += 1
+
+                # Drawing only if it is done before the next tick, skipping the frame otherwise.
+                # With a frame_rate, the ticks before the next frame time aren't drawn,
+                # their steps are drawn with the next frame.
+                if game.over:
+                    break
+                now = loop.time()
+                if now >= next_tick:
+                    self.skipped_frames += 1
+                elif self.frame_time is None:
+                    self.draw()
+                elif now >= next_frame:
+                    self.draw()
+                    next_frame = max(next_frame + self.frame_time, now)
+        finally:
+            if input_task is not None:
+                input_task.cancel()
+                try:
+                    await input_task
+                except asyncio.CancelledError:
+                    pass
+                close = getattr(self.read_key, 'close', None)
+                if close is not None:
+                    close()
+
+        return game
+
+
+
+async def run_sessions(sessions):
+    """
+    Plays all the sessions at the same time. Returns their Game objects.
+    """
+    return await asyncio.gather(*(session.run() for session in sessions))
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of a game with many snakes on one grid.
+All the snakes move at the same time, then the crashes are checked.
+A snake dies if its head goes out of the grid, meets another head,
+or lands on its own body or on the body of another snake.
+
+Every snake is on the occupancy of the grid, so a crash is found by looking
+at the head coordinates only. A step takes time by the number of snakes,
+however long they are. Only a snake that crashed has its body walked,
+to tell if it crashed into itself.
+
+Run it with:
+    python snake_multi.py --players 200 --length 500 --height 500
+to see how fast the steps are, with wandering snakes.
+"""
+
+
+import argparse
+import random
+import time
+
+import terminal_snake as ts
+
+
+SPAWN_TRIES = 1000
+# New snakes are put on random free coordinates. If no place is found
+# after this many tries, there isn't enough space for them.
+
+CRASHES = ('wall', 'head', 'self', 'body')
+# Why a snake died. 'head' is meeting the head of another snake,
+# 'body' is landing on the body of another snake.
+
+
+
+class MultiGame:
+    """
+    Rules of a game with many snakes, around a Grid.
+    Like terminal_snake.Game, it doesn't take any input, print or wait.
+    Snakes are known by their player number, from 0 to players-1.
+    """
+    def __init__(self, length, height, players, char_dict=None, seed=None, fruits=None):
+        """
+        Starts a new game on a LengthxHeight grid with players snakes.
+        char_dict is passed to the Grid, and seed to the random.Random object.
+        fruits is how many fruits can be on the grid at once, players if None.
+        Raises a ValueError if there isn't enough space for the snakes.
+        """
+        if players < 1:
+            raise ValueError('There should be at least one player.')
+        self.rng = random.Random(seed)
+        self.grid = ts.Grid(length, height, char_dict, self.rng)
+        self.max_fruits = players if fruits is None else fruits
+
+        self.snakes = [self.spawn_snake() for _ in range(players)]
+        # snakes stores the snakes of all players, dead or alive, by player number.
+
+        self.alive = list(range(players))
+        self.s_list = list(self.snakes)
+        # alive stores the player numbers of the living snakes,
+        # and s_list their snakes, for the renderers.
+
+        self.f_list = []
+        self.fruit_at = {}
+        # fruit_at stores the fruits by their coordinates, so heads find them at once.
+
+        self.f_eaten = [0] * players
+        self.crashes = [None] * players
+        self.died_at = [None] * players
+        # crashes stores why each snake died, one of CRASHES, and died_at the step.
+        # They are None while the snake is alive.
+
+        self.steps = 0
+        self.over = False
+        self.won = False
+        self.winner = None
+        # won is True if the snakes covered the whole grid.
+        # winner is the player number of the last living snake, if there is one.
+
+
+    def spawn_snake(self):
+        """
+        Returns a new snake, on free coordinates of the grid, and puts it on the grid.
+        Raises a ValueError if no place is found for it.
+        """
+        grid = self.grid
+        occupancy = grid.occupancy
+        length, height = grid.grid_area
+
+        for _ in range(SPAWN_TRIES):
+            head = occupancy.random_free(self.rng)
+            if head is None:
+                break
+            head_x, head_y = head
+            # Like Grid.spawn_new_snake, head isn't on the borders.
+            if not (0 < head_x < length-1 and 0 < head_y < height-1):
+                continue
+
+            tails = [coords for coords in ((head_x-1, head_y), (head_x+1, head_y),
+                                           (head_x, head_y-1), (head_x, head_y+1))
+                     if not occupancy.is_taken(coords)]
+            if tails:
+                snake = ts.Snake(head, self.rng.choice(tails), occupancy=occupancy)
+                snake.occupy_space()
+                return snake
+
+        raise ValueError('There is no space left for the snakes.')
+
+
+    def spawn_fruits(self):
+        """
+        Spawns fruits until there are max_fruits of them, or the grid is full.
+        """
+        while len(self.f_list) < self.max_fruits:
+            fruit = self.grid.spawn_fruit()
+            if fruit is None:
+                break
+            fruit.occupy_space()
+            self.f_list.append(fruit)
+            self.fruit_at[fruit.coords_list[0]] = fruit
+
+
+    def step(self, moves=None):
+        """
+        Assumes moves is a dict or a list of directions, one of r,l,u,d or None,
+        by player number. Players that aren't in it keep their directions.
+        Moves every living snake at once, then checks the crashes and eating.
+        None or a 180 degree turn keeps the direction of the snake.
+        Returns True if the game is over, False otherwise.
+        """
+        if self.over:
+            raise ValueError('Game is over.')
+
+        grid = self.grid
+        cells = grid.occupancy.cells
+        snakes = self.snakes
+        if moves is None:
+            moves = {}
+        elif not isinstance(moves, dict):
+            moves = dict(enumerate(moves))
+
+        # All the snakes move first. Tails move away at the same time,
+        # so a head can take the place a tail has just left.
+        head_counts = {}
+        for i in self.alive:
+            snake = snakes[i]
+            old_dir = snake.snake_body[0][1]
+            new_dir = moves.get(i)
+            if new_dir is None or new_dir == ts.OPPOSITE_DIRECTIONS[old_dir]:
+                new_dir = old_dir
+            snake.move_snake(new_dir)
+
+            head = snake.coords_list[0]
+            head_counts[head] = head_counts.get(head, 0) + 1
+        self.steps += 1
+
+        # Spawn fruits every 5 steps if there aren't enough of them.
+        if self.steps % ts.SPAWN_EVERY == 0 and len(self.f_list) < self.max_fruits:
+            self.spawn_fruits()
+
+        # Then the crashes are checked, before any dead snake is removed.
+        # So snakes that crash into each other both die.
+        dead = []
+        for i in self.alive:
+            snake = snakes[i]
+            head = snake.coords_list[0]
+
+            if snake.out_of_grid(grid):
+                crash = 'wall'
+            elif head_counts[head] > 1:
+                crash = 'head'
+            elif cells[head] - (head in self.fruit_at) > 1:
+                # Something other than its head and a fruit is on the head.
+                # Only now the body is walked, to tell whose body it is.
+                crash = 'self' if snake.is_head_tail_crash() else 'body'
+            else:
+                continue
+            dead.append(i)
+            self.crashes[i] = crash
+            self.died_at[i] = self.steps
+
+        if dead:
+            for i in dead:
+                snakes[i].empty_space()
+            dead = set(dead)
+            self.alive = [i for i in self.alive if i not in dead]
+            self.s_list = [snakes[i] for i in self.alive]
+
+        # Game is over when the snakes cover the whole grid, when every snake
+        # is dead, or when only one is left of many.
+        if grid.is_full() or not self.alive or (len(self.snakes) > 1 and len(self.alive) == 1):
+            self.over = True
+            self.won = grid.is_full()
+            if len(self.alive) == 1:
+                self.winner = self.alive[0]
+            return True
+
+        # Snakes eat the fruits on their heads. No two heads are on the same fruit,
+        # they would have crashed.
+        for i in self.alive:
+            snake = snakes[i]
+            fruit = self.fruit_at.get(snake.coords_list[0])
+            if fruit is not None and snake.eat_fruit(fruit):
+                del self.fruit_at[fruit.coords_list[0]]
+                self.f_list.remove(fruit)
+                self.f_eaten[i] += 1
+                snake.grow_snake()
+
+        return False
+
+
+
+def wander_policy(game, i):
+    """
+    An example policy for the player i of a MultiGame.
+    Goes straight, and turns to a random direction that doesn't crash at once,
+    if going straight does. Doesn't look at the moves of the other snakes.
+    """
+    snake = game.snakes[i]
+    head_x, head_y = snake.coords_list[0]
+    length, height = game.grid.grid_area
+    cells = game.grid.occupancy.cells
+    old_dir = snake.snake_body[0][1]
+
+    def is_safe(new_dir):
+        step_x, step_y = ts.DIRECTION_STEPS[new_dir]
+        coords = (head_x + step_x, head_y + step_y)
+        if not (0 <= coords[0] < length and 0 <= coords[1] < height):
+            return False
+        return coords not in cells or coords in game.fruit_at
+
+    if is_safe(old_dir) and game.rng.random() > 0.1:
+        return old_dir
+    choices = [d for d in 'rlud' if d != ts.OPPOSITE_DIRECTIONS[old_dir] and is_safe(d)]
+    if choices:
+        return game.rng.choice(choices)
+    return None
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plays a game of wandering snakes, and times it.')
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--length', type=int, default=500)
+    parser.add_argument('--height', type=int, default=500)
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    game = MultiGame(args.length, args.height, args.players, seed=args.seed)
+    # Snakes grow a lot for the timing, so their bodies are long.
+    for snake in game.snakes:
+        snake.growth = args.steps
+
+    start = time.perf_counter()
+    moves_time = 0.0
+    while not game.over and game.steps < args.steps:
+        moves_start = time.perf_counter()
+        moves = {i: wander_policy(game, i) for i in game.alive}
+        moves_time += time.perf_counter() - moves_start
+        game.step(moves)
+    seconds = time.perf_counter() - start - moves_time
+
+    sections = sum(snake.snake_len for snake in game.snakes)
+    print(f'{game.steps} steps in {seconds:.2f} s, {game.steps / seconds:,.0f} steps/s '
+          f'(the policy took {moves_time:.2f} s more)')
+    print(f'{len(game.alive)} of {args.players} snakes alive, {sections:,} sections in total')
+    print('Crashes:', {crash: game.crashes.count(crash) for crash in CRASHES})
+    if game.winner is not None:
+        print(f'Player {game.winner} won.')
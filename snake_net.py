@@ -0,0 +1,565 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of a server that plays games and lets spectators
+watch them over TCP, and a terminal client for the spectators.
+
+Messages are JSON objects, one on each line. A keyframe has the whole
+state of the game. Every tick after it, only a delta is sent:
+    {"t": 12, "m": "rRl", "x": [1], "f+": [[3, 4]], "f-": [[7, 1]]}
+t is the step. m has the direction each living snake moved to, in the
+order of their numbers, upper case if it grew and kept its tail. x has
+the snakes that died, f+ the fruits that spawned and f- the eaten ones.
+Keyframes are sent every KEYFRAME_EVERY ticks, to new spectators, and to
+spectators that were too slow and missed some deltas.
+
+Run it with:
+    python snake_net.py serve --players 4       (play games with bots, and serve them)
+    python snake_net.py watch                   (watch the games on the terminal)
+    python snake_net.py check                   (serve and watch on localhost, and compare)
+"""
+
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+
+import terminal_snake as ts
+import snake_loop
+
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+KEYFRAME_EVERY = 50
+# A keyframe is sent to everyone every this many ticks.
+
+QUEUE_SIZE = 64
+# Messages waiting to be sent to a spectator. If its queue is full,
+# the spectator is too slow. Its queue is emptied, and it gets a keyframe
+# on the next tick, instead of the deltas it missed.
+
+WRITE_BUFFER = 16 * 1024
+# Bytes the transport and the socket of a spectator can each buffer,
+# before sending to it waits.
+
+
+
+def encode(message):
+    """
+    Returns message as a line of compact JSON, in bytes.
+    """
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+def game_snakes(game):
+    """
+    Assumes game is a terminal_snake.Game or a snake_multi.MultiGame.
+    Returns the list of its snakes, and the list of the numbers of the living ones.
+    """
+    if hasattr(game, 'snakes'):
+        return game.snakes, game.alive
+    return [game.snake], [0]
+
+
+def keyframe(game):
+    """
+    Returns the keyframe message of game.
+    """
+    snakes, alive = game_snakes(game)
+    return {'k': 1, 'size': list(game.grid.grid_area), 't': game.steps, 'over': game.over,
+            'snakes': [[i, [[x, y, d] for (x, y), d in snakes[i].snake_body]] for i in alive],
+            'fruits': [list(fruit.coords_list[0]) for fruit in game.f_list]}
+
+
+
+class Spectator:
+    """
+    A connected spectator, and the messages waiting to be sent to it.
+    """
+    def __init__(self, writer, queue_size=QUEUE_SIZE):
+        self.writer = writer
+        self.queue = asyncio.Queue(queue_size)
+        self.handler = asyncio.current_task()
+        # handler is the task that serves the spectator, see SpectatorServer.connect.
+        self.resync = True
+        # resync is True if the spectator needs a keyframe, before any delta.
+        self.dropped = 0
+        # Number of times its queue got full.
+
+
+    def send(self, line):
+        """
+        Puts line in the queue. If the queue is full, it's emptied, and
+        the spectator waits for a keyframe.
+        Returns True if line is queued, False otherwise.
+        """
+        try:
+            self.queue.put_nowait(line)
+            return True
+        except asyncio.QueueFull:
+            self.clear()
+            self.dropped += 1
+            self.resync = True
+            return False
+
+
+    def clear(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+    async def write(self):
+        """
+        Sends the queued lines until None is queued or the connection is lost.
+        Waits for the socket, so a slow spectator doesn't fill the memory.
+        """
+        writer = self.writer
+        try:
+            while True:
+                line = await self.queue.get()
+                if line is None:
+                    break
+                writer.write(line)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+
+class SpectatorServer:
+    """
+    Plays games on the asyncio loop, and broadcasts them to the spectators.
+    """
+    def __init__(self, new_game, policy=None, tick=0.2, host=HOST, port=PORT,
+                 keyframe_every=KEYFRAME_EVERY):
+        """
+        new_game is a function that returns a new game, a terminal_snake.Game
+        or a snake_multi.MultiGame, for every round.
+        policy is a function that takes the game, and returns what its step
+        takes as the next move. None keeps the directions of the snakes.
+        port 0 takes any free port. The port is known after start.
+        """
+        self.new_game = new_game
+        self.policy = policy
+        self.tick = tick
+        self.host = host
+        self.port = port
+        self.keyframe_every = keyframe_every
+
+        self.game = None
+        self.server = None
+        self.spectators = set()
+
+        self.alive = []
+        self.lengths = []
+        self.fruits = set()
+        # Living snakes, their lengths and the fruit coordinates before the last step.
+        # The delta is what changed since then.
+
+        self.sent_bytes = 0
+
+
+    async def start(self):
+        """
+        Starts listening for the spectators.
+        """
+        self.server = await asyncio.start_server(self.connect, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+
+    async def connect(self, reader, writer):
+        """
+        Serves a spectator until it disconnects. Spectators don't send anything,
+        reading is only for knowing when they leave.
+        """
+        # Buffers are kept small, so a slow spectator is found soon.
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER)
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, WRITE_BUFFER)
+        spectator = Spectator(writer)
+        if self.game is not None:
+            spectator.send(encode(keyframe(self.game)))
+            spectator.resync = False
+        self.spectators.add(spectator)
+
+        write_task = asyncio.ensure_future(spectator.write())
+        try:
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self.spectators.discard(spectator)
+            write_task.cancel()
+
+
+    def broadcast(self, message, force_keyframe=False):
+        """
+        Sends message to every spectator. Spectators that need a keyframe,
+        or all of them if force_keyframe is True, get a keyframe instead.
+        """
+        line = encode(message)
+        key_line = None
+        for spectator in list(self.spectators):
+            if spectator.resync or force_keyframe:
+                if key_line is None:
+                    key_line = encode(keyframe(self.game))
+                if spectator.send(key_line):
+                    spectator.resync = False
+                    self.sent_bytes += len(key_line)
+            elif spectator.send(line):
+                self.sent_bytes += len(line)
+
+
+    def remember(self, game):
+        snakes, alive = game_snakes(game)
+        self.lengths = [snakes[i].snake_len for i in alive]
+        self.fruits = {fruit.coords_list[0] for fruit in game.f_list}
+
+
+    def delta(self, game, alive):
+        """
+        Returns the delta message of the last step of game.
+        alive is the numbers of the snakes that were alive before the step.
+        """
+        snakes, now_alive = game_snakes(game)
+        moves = []
+        for i, length in zip(alive, self.lengths):
+            snake = snakes[i]
+            new_dir = snake.snake_body[0][1]
+            moves.append(new_dir.upper() if snake.snake_len > length else new_dir)
+        message = {'t': game.steps, 'm': ''.join(moves)}
+
+        if len(now_alive) < len(alive):
+            now_alive = set(now_alive)
+            message['x'] = [i for i in alive if i not in now_alive]
+
+        fruits = {fruit.coords_list[0] for fruit in game.f_list}
+        if fruits != self.fruits:
+            message['f+'] = [list(coords) for coords in fruits - self.fruits]
+            message['f-'] = [list(coords) for coords in self.fruits - fruits]
+        if game.over:
+            message['over'] = True
+        return message
+
+
+    def on_step(self, session):
+        """
+        Broadcasts the step that the session has just played.
+        """
+        game = session.game
+        message = self.delta(game, self.alive)
+        self.broadcast(message, game.steps % self.keyframe_every == 0)
+
+        self.alive = list(game_snakes(game)[1])
+        self.remember(game)
+
+
+    async def play(self, games=1, pause=1.0):
+        """
+        Plays games rounds, forever if it's 0, waiting pause seconds between them.
+        """
+        played = 0
+        while not games or played < games:
+            game = self.game = self.new_game()
+            self.alive = list(game_snakes(game)[1])
+            self.remember(game)
+            self.broadcast(keyframe(game), force_keyframe=True)
+
+            session = snake_loop.Session(game, tick=self.tick, on_step=self.on_step,
+                                         policy=self.policy)
+            await session.run()
+            played += 1
+            await asyncio.sleep(pause)
+
+
+    async def close(self, timeout=1.0):
+        """
+        Lets the spectators get their queued messages in timeout seconds,
+        and disconnects them. Then stops listening.
+        """
+        spectators = list(self.spectators)
+        for spectator in spectators:
+            if not spectator.send(None):
+                spectator.send(None)
+        handlers = [spectator.handler for spectator in spectators]
+        if handlers:
+            await asyncio.wait(handlers, timeout=timeout)
+
+        # Spectators that still didn't leave are cut off.
+        for spectator in list(self.spectators):
+            spectator.writer.transport.abort()
+        if self.spectators:
+            await asyncio.wait([spectator.handler for spectator in self.spectators])
+
+        self.server.close()
+        await self.server.wait_closed()
+
+
+
+class SpectatorClient:
+    """
+    State of a watched game, rebuilt from the messages of the server.
+    Snakes and fruits are real Snake and Fruit objects on a Grid,
+    so the renderers can draw them.
+    """
+    def __init__(self, char_dict=None):
+        self.char_dict = char_dict
+        self.grid = None
+        self.snakes = {}
+        self.alive = []
+        self.fruits = {}
+        # snakes stores the living snakes by number, and fruits the fruits by coordinates.
+
+        self.steps = 0
+        self.over = False
+        self.keyframes = 0
+        self.deltas = 0
+
+
+    def apply(self, message):
+        """
+        Updates the state with a message. Returns True if it was a keyframe,
+        which means everything should be drawn again.
+        """
+        if 'k' in message:
+            self.apply_keyframe(message)
+            return True
+        if self.grid is not None:
+            self.apply_delta(message)
+        return False
+
+
+    def apply_keyframe(self, message):
+        self.grid = ts.Grid(*message['size'], char_dict=self.char_dict)
+        occupancy = self.grid.occupancy
+
+        self.snakes = {}
+        for i, sections in message['snakes']:
+            snake = ts.Snake(*[(x, y) for x, y, d in sections], occupancy=occupancy)
+            # Directions are sent, instead of guessing them from the coordinates like Snake does.
+            snake.snake_body.clear()
+            snake.snake_body.extend(((x, y), d) for x, y, d in sections)
+            snake.occupy_space()
+            self.snakes[i] = snake
+        self.alive = [i for i, sections in message['snakes']]
+
+        self.fruits = {}
+        for x, y in message['fruits']:
+            self.add_fruit((x, y))
+
+        self.steps = message['t']
+        self.over = message['over']
+        self.keyframes += 1
+
+
+    def apply_delta(self, message):
+        # Same order as the game. Snakes move, the dead ones are removed, then fruits.
+        for i, new_dir in zip(self.alive, message['m']):
+            snake = self.snakes[i]
+            if new_dir.isupper():
+                snake.grow_snake()
+            snake.move_snake(new_dir.lower())
+
+        for i in message.get('x', ()):
+            self.snakes.pop(i).empty_space()
+            self.alive.remove(i)
+
+        for x, y in message.get('f-', ()):
+            self.fruits.pop((x, y)).empty_space()
+        for x, y in message.get('f+', ()):
+            self.add_fruit((x, y))
+
+        self.steps = message['t']
+        self.over = message.get('over', False)
+        self.deltas += 1
+
+
+    def add_fruit(self, coords):
+        fruit = ts.Fruit(coords, occupancy=self.grid.occupancy)
+        fruit.occupy_space()
+        self.fruits[coords] = fruit
+
+
+    def s_list(self):
+        return [self.snakes[i] for i in self.alive]
+
+
+    def f_list(self):
+        return list(self.fruits.values())
+
+
+    async def watch(self, host=HOST, port=PORT, on_message=None):
+        """
+        Connects to the server and applies its messages until it disconnects.
+        on_message is called with the client and whether it was a keyframe,
+        after every message.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                is_keyframe = self.apply(json.loads(line))
+                if on_message is not None:
+                    on_message(self, is_keyframe)
+        finally:
+            writer.close()
+
+
+
+def watch_terminal(host=HOST, port=PORT):
+    """
+    Watches the games of the server on the terminal, until it disconnects.
+    """
+    import blessed
+    import main
+    import snake_render
+
+    term = blessed.Terminal()
+    client = SpectatorClient(main.snake_chars(term))
+    renderers = {}
+
+    def draw(client, is_keyframe):
+        if client.grid is None:
+            return
+        if is_keyframe:
+            # Keyframes make a new grid, so a new renderer is needed.
+            if snake_render.fits_terminal(client.grid, term):
+                renderers['grid'] = snake_render.DiffRenderer(client.grid, term)
+            else:
+                renderers['grid'] = snake_render.ViewportRenderer(client.grid, term)
+            print(term.clear, end='')
+        status = f'{client.steps} steps, {len(client.alive)} snakes'
+        if client.over:
+            status += ', game over'
+        renderers['grid'].render(client.s_list(), client.f_list(), status)
+
+    with term.fullscreen(), term.hidden_cursor():
+        try:
+            asyncio.run(client.watch(host, port, draw))
+        except KeyboardInterrupt:
+            pass
+
+
+def bot_game(length, height, players, seed=None):
+    """
+    Returns a function that makes new games, and the policy of their bots.
+    One player plays terminal_snake.Game, more play snake_multi.MultiGame.
+    """
+    import snake_tournament
+    seeds = random.Random(seed)
+
+    if players == 1:
+        def new_game():
+            return ts.Game(length, height, seed=seeds.getrandbits(32))
+        return new_game, snake_tournament.greedy_policy
+
+    import snake_multi
+
+    def new_game():
+        return snake_multi.MultiGame(length, height, players, seed=seeds.getrandbits(32))
+
+    def policy(game):
+        return {i: snake_multi.wander_policy(game, i) for i in game.alive}
+    return new_game, policy
+
+
+async def check(players=8, games=3, spectators=3, length=40, height=30, tick=0.001, keyframe_every=5):
+    """
+    Serves games on localhost, watches them with spectators, one of them too slow
+    to read, and compares their last states with the games of the server.
+    Returns True if they are all the same, False otherwise.
+    """
+    new_game, policy = bot_game(length, height, players, seed=0)
+    finals = []
+
+    def new_recorded_game():
+        finals.append(new_game())
+        return finals[-1]
+
+    server = SpectatorServer(new_recorded_game, policy, tick=tick, port=0,
+                             keyframe_every=keyframe_every)
+    await server.start()
+
+    clients = [SpectatorClient() for _ in range(spectators)]
+    endings = [[] for _ in clients]
+    # endings stores the last state of every game a client has watched.
+
+    def on_message(i):
+        def record(client, is_keyframe):
+            if client.over and (not endings[i] or endings[i][-1][0] != client.keyframes):
+                endings[i].append((client.keyframes, state(client.s_list(), client.fruits)))
+        return record
+
+    def state(snakes, fruits):
+        return ([list(snake.snake_body) for snake in snakes], sorted(fruits))
+
+    watchers = [asyncio.ensure_future(client.watch('127.0.0.1', server.port, on_message(i)))
+                for i, client in enumerate(clients)]
+
+    # A spectator that connects but never reads, with a small socket buffer,
+    # so its queue gets full.
+    slow_socket = socket.socket()
+    slow_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    slow_socket.connect(('127.0.0.1', server.port))
+    slow_reader, slow_writer = await asyncio.open_connection(sock=slow_socket)
+
+    await asyncio.sleep(0.1)
+    await server.play(games, pause=0.05)
+    dropped = sum(spectator.dropped for spectator in server.spectators)
+    slow_writer.close()
+    await server.close()
+    await asyncio.gather(*watchers)
+
+    expected = []
+    for game in finals:
+        snakes, alive = game_snakes(game)
+        fruits = [fruit.coords_list[0] for fruit in game.f_list]
+        expected.append(state([snakes[i] for i in alive], fruits))
+
+    same = all([ending[1] for ending in client_endings] == expected for client_endings in endings)
+    print(f'{games} games, {spectators} spectators, {server.sent_bytes:,} bytes sent, '
+          f'slow spectator dropped {dropped} times.')
+    print('Spectators saw the same games.' if same else 'Spectators saw different games!')
+    return same
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serves games to spectators, or watches them.')
+    parser.add_argument('mode', choices=('serve', 'watch', 'check'))
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--length', type=int, default=30)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--players', type=int, default=1)
+    parser.add_argument('--tick', type=float, default=0.1)
+    parser.add_argument('--games', type=int, default=0, help='rounds to play, 0 for forever')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    if args.mode == 'watch':
+        watch_terminal(args.host, args.port)
+    elif args.mode == 'check':
+        raise SystemExit(0 if asyncio.run(check()) else 1)
+    else:
+        async def serve():
+            new_game, policy = bot_game(args.length, args.height, args.players, args.seed)
+            server = SpectatorServer(new_game, policy, args.tick, args.host, args.port)
+            await server.start()
+            print(f'Serving on {server.host}:{server.port}')
+            try:
+                await server.play(args.games)
+            finally:
+                await server.close()
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of a profiler for the phases of a game tick,
+such as moving the game, building the frame and writing it to the terminal.
+It keeps the last durations of every phase, and gives their percentiles.
+When profiling is off, NullProfiler is used, which does nothing.
+"""
+
+
+import json
+import time
+from collections import deque
+
+
+WINDOW = 600
+# Number of last durations kept for each phase. 2 minutes at 5 ticks a second.
+
+PERCENTILES = (50, 95, 99)
+
+STATUS_EVERY = 10
+# The status line is computed again every this many calls, it is cached between them.
+
+
+
+class Phase:
+    """
+    Context manager that measures a phase and records it to its profiler.
+    """
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+
+
+
+class FrameProfiler:
+    """
+    Keeps the durations of the phases, WINDOW of them for each phase.
+    Usage:
+        with profiler.phase('sim'):
+            game.step()
+    """
+    enabled = True
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.durations = {}
+        # Last durations of each phase in seconds, by phase name, in the order they are first seen.
+        self.counts = {}
+        # Number of all the recorded durations of each phase.
+
+        self.phases = {}
+        # Phase objects by name, so they aren't created again every tick.
+
+        self.status_calls = 0
+        self.status = ''
+
+
+    def phase(self, name):
+        """
+        Returns a context manager that measures the phase with name.
+        """
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(self, name)
+        return phase
+
+
+    def record(self, name, seconds):
+        """
+        Records a duration of the phase with name.
+        """
+        durations = self.durations.get(name)
+        if durations is None:
+            durations = self.durations[name] = deque(maxlen=self.window)
+            self.counts[name] = 0
+        durations.append(seconds)
+        self.counts[name] += 1
+
+
+    def percentiles(self, name):
+        """
+        Returns a dict of the PERCENTILES of the durations of the phase with name,
+        in seconds. Such as {50: 0.0012, 95: 0.003, 99: 0.004}.
+        """
+        durations = sorted(self.durations.get(name, ()))
+        if not durations:
+            return {p: 0.0 for p in PERCENTILES}
+        n = len(durations)
+        return {p: durations[min(n-1, n*p // 100)] for p in PERCENTILES}
+
+
+    def status_line(self):
+        """
+        Returns a short line with the p50/p95/p99 of every phase in milliseconds.
+        """
+        if self.status_calls % STATUS_EVERY == 0:
+            parts = []
+            for name in self.durations:
+                p = self.percentiles(name)
+                parts.append(f'{name} {p[50]*1000:.2f}/{p[95]*1000:.2f}/{p[99]*1000:.2f}')
+            self.status = 'ms p50/95/99: ' + ' | '.join(parts) if parts else ''
+        self.status_calls += 1
+        return self.status
+
+
+    def report(self):
+        """
+        Returns the stats of every phase as a dict, ready for JSON.
+        """
+        report = {}
+        for name, durations in self.durations.items():
+            report[name] = {'count': self.counts[name],
+                            'window': len(durations),
+                            'mean_ms': sum(durations) / len(durations) * 1000}
+            for p, seconds in self.percentiles(name).items():
+                report[name][f'p{p}_ms'] = seconds * 1000
+        return report
+
+
+    def export(self, path):
+        """
+        Writes the report to the JSON file at path.
+        """
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=1)
+
+
+
+class NullPhase:
+    """
+    Context manager that doesn't measure anything.
+    """
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+
+class NullProfiler:
+    """
+    Profiler that does nothing, for when profiling is off.
+    """
+    enabled = False
+    null_phase = NullPhase()
+
+    def phase(self, name):
+        return self.null_phase
+
+
+    def record(self, name, seconds):
+        pass
+
+
+    def status_line(self):
+        return ''
+
+
+    def report(self):
+        return {}
+
+
+    def export(self, path):
+        pass
+
+
+
+NULL_PROFILER = NullProfiler()
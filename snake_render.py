@@ -0,0 +1,622 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of renderers for the game.
+Grid.print_grid_list prints the whole grid every frame. Renderers
+here try to print less, for bigger grids and faster games.
+"""
+
+
+import re
+import sys
+from itertools import islice
+from math import ceil
+
+import snake_profile
+
+
+ESCAPE_SEQUENCE = re.compile(r'\x1b\[[0-9;?]*[A-Za-z]|\x1b\([A-Z]')
+# Matches the terminal escape sequences, such as colors and cursor moves.
+
+SYMBOL_PARTS = re.compile(r'^((?:{0})*)(.*?)((?:{0})*)$'.format(ESCAPE_SEQUENCE.pattern), re.DOTALL)
+# Splits a symbol to its style, its text and its reset.
+# Such as '\x1b[41m', '  ' and '\x1b[m' for a red block.
+
+MINIMAP_WIDTH = 32
+# Columns of the minimap of ViewportRenderer, next to the viewport.
+
+MINIMAP_COLORS = {'empty': 0, 'view': 7, 'snake': 3, 'fruit': 1}
+# ANSI colors of the minimap pixels. 'view' is an empty pixel in the viewport.
+
+HALF_BLOCK = '\u2580'
+# Upper half block. Its foreground is the upper pixel, and its background the lower one.
+
+
+def visible_length(text, term=None):
+    """
+    Returns how many terminal columns text takes, without escape sequences.
+    Uses term.length if term, a blessed.Terminal, is given.
+    """
+    if term is not None:
+        return term.length(text)
+    return len(ESCAPE_SEQUENCE.sub('', text))
+
+
+def fits_terminal(grid, term):
+    """
+    Assumes term is a blessed.Terminal.
+    Returns True if the whole grid and a status line under it fit in term.
+    """
+    cell_width = visible_length(grid.char_dict['empty'], term)
+    length, height = grid.grid_area
+    return length * cell_width <= term.width and height + 1 <= term.height
+
+
+def move_sequence(x, y, term=None):
+    """
+    Returns the sequence that moves the cursor to column x and row y.
+    Uses term.move_xy if term, a blessed.Terminal, is given.
+    """
+    if term is not None:
+        return term.move_xy(x, y)
+    return '\x1b[{};{}H'.format(y+1, x+1)
+
+
+
+class DiffRenderer:
+    """
+    Renderer that keeps the last frame, and only draws the cells that changed
+    since then. Such as the new head, the old head and the left tail.
+    """
+    def __init__(self, grid, term=None, stream=None, origin=(0, 0), profiler=None):
+        """
+        Assumes grid is a Grid object and term is a blessed.Terminal or None.
+        Frames are written to stream, sys.stdout if it is None.
+        origin is the terminal column and row of the top left corner of the grid.
+        profiler is a snake_profile.FrameProfiler, that times building
+        and writing the frames, or None.
+        """
+        self.grid = grid
+        self.term = term
+        self.stream = stream
+        self.origin = origin
+        self.profiler = snake_profile.NULL_PROFILER if profiler is None else profiler
+
+        self.char_dict = grid.char_dict
+        self.cell_width = visible_length(self.char_dict['empty'], term)
+        # Each cell is this many columns wide. 2 for the colored blocks of main.py.
+
+        self.frame = {}
+        # frame stores the symbols of the cells that weren't empty in the last frame.
+        # Example: {(1, 1): '>', (0, 1): '-', (4, 3): 'p'}
+
+        self.heads = {}
+        self.moves = {}
+        # Head coordinates of the snakes in the last frame, and the snakes with
+        # the number of moves they made then, by id of the snake. The snakes are
+        # kept, so their ids can't be given to new snakes.
+
+        self.height = grid.grid_area[1]
+        # Rows the grid takes on the terminal. Status is written under them.
+
+        self.full_redraw = True
+        grid.occupancy.changed = set()
+        # From now on occupancy will tell which coordinates are taken or left.
+
+
+    def invalidate(self):
+        """
+        Makes the next frame draw the whole grid again.
+        For example after the screen is cleared.
+        """
+        self.full_redraw = True
+
+
+    def render(self, snakes_iter, fruits_iter, status=None):
+        """
+        Assumes snake_iter and fruit_iter are iterables that contain
+        Snake and Fruit objects, respectively.
+        Draws the changes since the last frame, and status under the grid
+        if it's given. Everything is written at once.
+        """
+        snakes = list(snakes_iter)
+        fruits = list(fruits_iter)
+
+        with self.profiler.phase('build'):
+            if self.full_redraw:
+                pieces = self.draw_all(snakes, fruits)
+            else:
+                pieces = self.draw_changes(snakes, fruits)
+
+            if status is not None:
+                pieces.append(move_sequence(self.origin[0], self.origin[1]+self.height, self.term))
+                pieces.append(status)
+                if self.term is not None:
+                    pieces.append(self.term.clear_eol)
+            frame = ''.join(pieces)
+
+        with self.profiler.phase('output'):
+            stream = self.stream or sys.stdout
+            stream.write(frame)
+            stream.flush()
+
+
+    def draw_all(self, snakes, fruits):
+        """
+        Returns the pieces of a frame that draws the whole grid,
+        and starts keeping the frame.
+        """
+        grid = self.grid
+        grid.run_grid(snakes, fruits)
+        grid.occupancy.changed.clear()
+
+        symbol_empty = self.char_dict['empty']
+        origin_x, origin_y = self.origin
+        pieces = []
+        self.frame = {}
+
+        for y, row in enumerate(grid.grid_list):
+            pieces.append(move_sequence(origin_x, origin_y+y, self.term))
+            pieces.append(''.join(row))
+
+            for x, symbol in enumerate(row):
+                if symbol != symbol_empty:
+                    self.frame[(x, y)] = symbol
+
+        self.remember_snakes(snakes)
+        self.full_redraw = False
+        return pieces
+
+
+    def remember_snakes(self, snakes):
+        """
+        Keeps the heads of snakes and their moves, as they are in this frame.
+        """
+        self.heads = {id(snake): snake.coords_list[0] for snake in snakes}
+        self.moves = {id(snake): (snake, snake.moves) for snake in snakes}
+
+
+    def draw_changes(self, snakes, fruits):
+        """
+        Returns the pieces of a frame that draws only the changed cells.
+        """
+        char_dict = self.char_dict
+        occupancy = self.grid.occupancy
+        new_symbols = {}
+
+        # Each move of a snake made a new head, and its old head a tail section.
+        # So the first moves+1 sections are drawn, even if the head came back to
+        # or passed its last drawn cell, when many moves share a frame.
+        for snake in snakes:
+            last = self.moves.get(id(snake))
+            if last is None:
+                # It's a new snake.
+                return self.draw_all(snakes, fruits)
+            moves = snake.moves - last[1]
+            if moves > snake.snake_len:
+                # Every section is new, the whole grid is drawn at once.
+                return self.draw_all(snakes, fruits)
+
+            head_coords, head_dir = snake.snake_body[0]
+            new_symbols[head_coords] = char_dict['head_'+head_dir]
+            for sect in islice(snake.snake_body, 1, moves+1):
+                new_symbols.setdefault(sect[0], char_dict['tail_'+sect[1]])
+        self.remember_snakes(snakes)
+
+        # Fruits are drawn over the snakes, like in Grid.run_grid.
+        for fruit in fruits:
+            new_symbols[fruit.coords_list[0]] = char_dict['fruit']
+
+        # Left coordinates are empty now.
+        for coords in occupancy.changed:
+            if coords not in new_symbols and not occupancy.is_taken(coords):
+                new_symbols[coords] = None
+        occupancy.changed.clear()
+
+        return self.draw_cells(new_symbols)
+
+
+    def draw_cells(self, new_symbols):
+        """
+        Assumes new_symbols is a dict of coordinates and their new symbols,
+        None for empty.
+        Returns the pieces that draw the ones that are different from the frame.
+        """
+        length, height = self.grid.grid_area
+        symbol_empty = self.char_dict['empty']
+        origin_x, origin_y = self.origin
+        frame = self.frame
+        pieces = []
+
+        for coords, symbol in new_symbols.items():
+            x, y = coords
+            # Such as the head of a snake that crashed to the wall.
+            if not (0 <= x < length and 0 <= y < height):
+                continue
+
+            if frame.get(coords) == symbol:
+                continue
+            if symbol is None:
+                frame.pop(coords, None)
+                symbol = symbol_empty
+            else:
+                frame[coords] = symbol
+
+            pieces.append(move_sequence(origin_x+x*self.cell_width, origin_y+y, self.term))
+            pieces.append(symbol)
+
+        return pieces
+
+
+
+class RowRenderer(DiffRenderer):
+    """
+    Renderer that draws whole rows, but only the rows that changed since
+    the last frame. Rows are merged, so a style is written once for the
+    cells next to each other that have it, instead of once for every cell.
+    For the colored blocks of main.py, a row takes a few bytes for every
+    color change, instead of about 20 bytes for every cell.
+    """
+    def __init__(self, grid, term=None, stream=None, origin=(0, 0), profiler=None):
+        """
+        Same as DiffRenderer.
+        """
+        DiffRenderer.__init__(self, grid, term, stream, origin, profiler)
+
+        self.rows = []
+        self.row_symbols = []
+        # rows stores the merged string of every row in the last frame,
+        # and row_symbols the symbols it was merged from, as a tuple.
+
+        self.parts = {}
+        # parts stores the style, text and reset of every symbol seen, by symbol.
+
+
+    def symbol_parts(self, symbol):
+        """
+        Returns the style, the text and the reset of symbol.
+        """
+        parts = self.parts.get(symbol)
+        if parts is None:
+            parts = self.parts[symbol] = SYMBOL_PARTS.match(symbol).groups()
+        return parts
+
+
+    def merge_row(self, symbols):
+        """
+        Assumes symbols is an iterable of the symbols of a row.
+        Returns the row as a string, writing each style only when it changes.
+        """
+        symbol_parts = self.symbol_parts
+        pieces = []
+        style = ''
+        reset = ''
+
+        for symbol in symbols:
+            new_style, text, new_reset = symbol_parts(symbol)
+            if new_style != style:
+                # Resetting first, so nothing of the last style is left.
+                pieces.append(reset)
+                pieces.append(new_style)
+                style = new_style
+                reset = new_reset
+            pieces.append(text)
+        pieces.append(reset)
+
+        return ''.join(pieces)
+
+
+    def draw_all(self, snakes, fruits):
+        """
+        Returns the pieces of a frame that draws the whole grid, merged by rows,
+        and starts keeping the frame.
+        """
+        DiffRenderer.draw_all(self, snakes, fruits)
+        origin_x, origin_y = self.origin
+
+        # Rows that are the same as a row of the last frame aren't merged again.
+        # Such as every row after invalidate, and the empty rows, which are all the same.
+        merged = dict(zip(self.row_symbols, self.rows))
+        self.row_symbols = [tuple(row) for row in self.grid.grid_list]
+        self.rows = []
+        for symbols in self.row_symbols:
+            row = merged.get(symbols)
+            if row is None:
+                row = merged[symbols] = self.merge_row(symbols)
+            self.rows.append(row)
+
+        pieces = []
+        for y, row in enumerate(self.rows):
+            pieces.append(move_sequence(origin_x, origin_y+y, self.term))
+            pieces.append(row)
+        return pieces
+
+
+    def draw_cells(self, new_symbols):
+        """
+        Assumes new_symbols is a dict of coordinates and their new symbols,
+        None for empty.
+        Returns the pieces that draw the rows with a cell that is different from the frame.
+        """
+        length, height = self.grid.grid_area
+        symbol_empty = self.char_dict['empty']
+        origin_x, origin_y = self.origin
+        frame = self.frame
+        changed_rows = set()
+
+        for coords, symbol in new_symbols.items():
+            x, y = coords
+            if not (0 <= x < length and 0 <= y < height):
+                continue
+
+            if frame.get(coords) == symbol:
+                continue
+            if symbol is None:
+                frame.pop(coords, None)
+            else:
+                frame[coords] = symbol
+            changed_rows.add(y)
+
+        # Other rows are the same as the last frame, they aren't drawn again.
+        pieces = []
+        for y in sorted(changed_rows):
+            symbols = tuple([frame.get((x, y), symbol_empty) for x in range(length)])
+            row = self.merge_row(symbols)
+            self.rows[y] = row
+            self.row_symbols[y] = symbols
+            pieces.append(move_sequence(origin_x, origin_y+y, self.term))
+            pieces.append(row)
+
+        return pieces
+
+
+
+class ViewportRenderer(DiffRenderer):
+    """
+    Renderer for grids bigger than the terminal. Draws only a window of the grid,
+    the viewport, that follows the head of the first snake. And a minimap of
+    the whole grid next to it, where a pixel is a square block of cells and
+    a character is 2 pixels, one above the other.
+    The whole grid is never built, frames take time and bytes by the size
+    of the terminal, and the length of the moves since the last frame.
+    """
+    def __init__(self, grid, term=None, stream=None, origin=(0, 0), profiler=None,
+                 view_size=None, minimap_width=MINIMAP_WIDTH):
+        """
+        Same as DiffRenderer.
+        view_size is the columns and the rows of the viewport, in cells.
+        If it is None, the viewport takes the terminal, except the minimap and the status.
+        minimap_width is the columns of the minimap, 0 for no minimap.
+        """
+        DiffRenderer.__init__(self, grid, term, stream, origin, profiler)
+        length, height = grid.grid_area
+
+        if view_size is None:
+            if term is None:
+                raise ValueError('view_size should be given without a terminal.')
+            view_size = ((term.width - minimap_width - 1) // self.cell_width, term.height - 1)
+        self.view_size = (max(1, min(view_size[0], length)), max(1, min(view_size[1], height)))
+        self.view = (0, 0)
+        # view is the coordinates of the top left cell of the viewport.
+
+        self.fruit_symbol = self.char_dict['fruit']
+        self.minimap_width = minimap_width
+        self.block = 1
+        self.minimap_size = (0, 0)
+        if minimap_width:
+            # Blocks are squares, as big as needed to fit the grid in the width
+            # of the minimap and the height of the viewport.
+            self.block = max(ceil(length / minimap_width), ceil(height / (2*self.view_size[1])))
+            pixels_x, pixels_y = ceil(length / self.block), ceil(height / self.block)
+            self.minimap_size = (pixels_x, ceil(pixels_y / 2))
+
+        self.pixels = {'snake': {}, 'fruit': {}}
+        # pixels stores how many snake and fruit cells are in the block of each pixel.
+
+        self.height = max(self.view_size[1], self.minimap_size[1])
+
+
+    def symbol_kind(self, symbol):
+        if symbol is None:
+            return None
+        return 'fruit' if symbol == self.fruit_symbol else 'snake'
+
+
+    def count_pixel(self, coords, kind, change):
+        """
+        Adds change to the kind count of the pixel of coords.
+        Returns the pixel.
+        """
+        pixel = (coords[0] // self.block, coords[1] // self.block)
+        counts = self.pixels[kind]
+        count = counts.get(pixel, 0) + change
+        if count:
+            counts[pixel] = count
+        else:
+            del counts[pixel]
+        return pixel
+
+
+    def follow(self, head):
+        """
+        Moves the viewport to the middle of head, if head is near its borders.
+        Returns True if the viewport moved, False otherwise.
+        """
+        length, height = self.grid.grid_area
+        view_x, view_y = self.view
+        view_length, view_height = self.view_size
+        head_x, head_y = head
+
+        # Head can go up to a quarter of the viewport near its borders.
+        margin_x, margin_y = view_length // 4, view_height // 4
+        if not view_x + margin_x <= head_x < view_x + view_length - margin_x:
+            view_x = max(0, min(head_x - view_length//2, length - view_length))
+        if not view_y + margin_y <= head_y < view_y + view_height - margin_y:
+            view_y = max(0, min(head_y - view_height//2, height - view_height))
+
+        if (view_x, view_y) == self.view:
+            return False
+        self.view = (view_x, view_y)
+        return True
+
+
+    def draw_all(self, snakes, fruits):
+        """
+        Returns the pieces of a frame that draws the whole viewport and minimap,
+        and starts keeping the frame. The frame is built from the snakes and
+        the fruits, in the same order as Grid.run_grid.
+        """
+        char_dict = self.char_dict
+        length, height = self.grid.grid_area
+        self.frame = frame = {}
+
+        for snake in snakes:
+            head_coords, head_dir = snake.snake_body[0]
+            frame[head_coords] = char_dict['head_'+head_dir]
+            for sect in islice(snake.snake_body, 1, None):
+                frame[sect[0]] = char_dict['tail_'+sect[1]]
+        for fruit in fruits:
+            frame[fruit.coords_list[0]] = char_dict['fruit']
+        for coords in [coords for coords in frame
+                       if not (0 <= coords[0] < length and 0 <= coords[1] < height)]:
+            del frame[coords]
+
+        self.pixels = {'snake': {}, 'fruit': {}}
+        if self.minimap_width:
+            for coords, symbol in frame.items():
+                self.count_pixel(coords, self.symbol_kind(symbol), 1)
+
+        self.grid.occupancy.changed.clear()
+        self.remember_snakes(snakes)
+        if snakes:
+            self.follow(snakes[0].coords_list[0])
+        self.full_redraw = False
+        return self.draw_view() + self.draw_minimap()
+
+
+    def draw_view(self):
+        """
+        Returns the pieces that draw every row of the viewport.
+        """
+        symbol_empty = self.char_dict['empty']
+        origin_x, origin_y = self.origin
+        view_x, view_y = self.view
+        view_length, view_height = self.view_size
+        frame = self.frame
+        pieces = []
+
+        for row in range(view_height):
+            y = view_y + row
+            pieces.append(move_sequence(origin_x, origin_y+row, self.term))
+            pieces.append(''.join([frame.get((x, y), symbol_empty)
+                                   for x in range(view_x, view_x+view_length)]))
+        return pieces
+
+
+    def pixel_color(self, pixel):
+        """
+        Returns the ANSI color of pixel. Fruits are shown over the snakes.
+        """
+        if pixel in self.pixels['fruit']:
+            return MINIMAP_COLORS['fruit']
+        if pixel in self.pixels['snake']:
+            return MINIMAP_COLORS['snake']
+
+        # Pixels with a cell in the viewport are lighter.
+        view_x, view_y = self.view
+        view_length, view_height = self.view_size
+        block = self.block
+        if (view_x // block <= pixel[0] <= (view_x+view_length-1) // block
+                and view_y // block <= pixel[1] <= (view_y+view_height-1) // block):
+            return MINIMAP_COLORS['view']
+        return MINIMAP_COLORS['empty']
+
+
+    def minimap_char(self, x, row):
+        """
+        Returns the character at column x and row of the minimap.
+        """
+        upper = self.pixel_color((x, 2*row))
+        if 2*row + 1 >= ceil(self.grid.grid_area[1] / self.block):
+            # Odd number of pixel rows, the last lower pixel isn't on the grid.
+            return '\x1b[3{};49m{}\x1b[m'.format(upper, HALF_BLOCK)
+        lower = self.pixel_color((x, 2*row + 1))
+        return '\x1b[3{};4{}m{}\x1b[m'.format(upper, lower, HALF_BLOCK)
+
+
+    def minimap_origin(self):
+        return (self.origin[0] + self.view_size[0]*self.cell_width + 1, self.origin[1])
+
+
+    def draw_minimap(self):
+        """
+        Returns the pieces that draw every row of the minimap.
+        """
+        if not self.minimap_width:
+            return []
+        origin_x, origin_y = self.minimap_origin()
+        columns, rows = self.minimap_size
+        pieces = []
+
+        for row in range(rows):
+            pieces.append(move_sequence(origin_x, origin_y+row, self.term))
+            pieces.append(''.join([self.minimap_char(x, row) for x in range(columns)]))
+        return pieces
+
+
+    def draw_cells(self, new_symbols):
+        """
+        Assumes new_symbols is a dict of coordinates and their new symbols,
+        None for empty.
+        Keeps the changes in the frame, and returns the pieces that draw the ones
+        in the viewport and the minimap characters they changed.
+        If the viewport moved to follow the head, both are drawn again.
+        """
+        length, height = self.grid.grid_area
+        symbol_empty = self.char_dict['empty']
+        origin_x, origin_y = self.origin
+        frame = self.frame
+        minimap = self.minimap_width
+        changed_chars = set()
+        changed_cells = []
+
+        for coords, symbol in new_symbols.items():
+            x, y = coords
+            if not (0 <= x < length and 0 <= y < height):
+                continue
+
+            old_symbol = frame.get(coords)
+            if old_symbol == symbol:
+                continue
+            if symbol is None:
+                del frame[coords]
+            else:
+                frame[coords] = symbol
+            changed_cells.append(coords)
+
+            if minimap:
+                old_kind, kind = self.symbol_kind(old_symbol), self.symbol_kind(symbol)
+                if old_kind != kind:
+                    if old_kind is not None:
+                        pixel = self.count_pixel(coords, old_kind, -1)
+                    if kind is not None:
+                        pixel = self.count_pixel(coords, kind, 1)
+                    changed_chars.add((pixel[0], pixel[1] // 2))
+
+        if self.heads and self.follow(next(iter(self.heads.values()))):
+            return self.draw_view() + self.draw_minimap()
+
+        pieces = []
+        view_x, view_y = self.view
+        view_length, view_height = self.view_size
+        for x, y in changed_cells:
+            if view_x <= x < view_x+view_length and view_y <= y < view_y+view_height:
+                pieces.append(move_sequence(origin_x+(x-view_x)*self.cell_width,
+                                            origin_y+y-view_y, self.term))
+                pieces.append(frame.get((x, y), symbol_empty))
+
+        minimap_x, minimap_y = self.minimap_origin()
+        for x, row in changed_chars:
+            pieces.append(move_sequence(minimap_x+x, minimap_y+row, self.term))
+            pieces.append(self.minimap_char(x, row))
+
+        return pieces
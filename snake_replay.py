@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of a compact replay format for the game.
+A game is decided by the seed, the size of the grid and the moves,
+so only they are stored, with 2 bits for each move. Replays are played
+again by simulating the game with terminal_snake.Game.
+
+A replay record is a header and the packed moves. Archives are files
+with records one after another, and they are read with mmap, so
+big archives can be scanned without loading them.
+"""
+
+
+import mmap
+import struct
+import sys
+
+import terminal_snake as ts
+
+
+MAGIC = b'SNKR'
+VERSION = 2
+# Fruits of version 1 were chosen by the order of the old free coordinates,
+# so those games can't be played again the same.
+
+HEADER = struct.Struct('<4sBBBxIIQII')
+# magic, version, crash, won, length, height, seed, steps, f_eaten
+# crash is the index of Game.crash in CRASHES.
+
+CRASHES = (None, 'wall', 'self')
+
+DIRECTIONS = 'rlud'
+# Each move is stored as the index of its direction in this string,
+# 4 moves in a byte, the first one in the lowest 2 bits.
+
+DECODED_BYTES = [''.join(DIRECTIONS[(byte >> shift) & 3] for shift in (0, 2, 4, 6))
+                 for byte in range(256)]
+# The 4 moves of every possible byte, so a byte is decoded at once.
+
+SNAPSHOT_EVERY = 1024
+# While playing a replay, the game is copied every this many steps,
+# so seeking back doesn't start from the first step.
+
+
+
+def packed_size(steps):
+    """
+    Returns the number of bytes of steps packed moves.
+    """
+    return (steps + 3) // 4
+
+
+
+class ReplayRecorder:
+    """
+    Plays a new game and records its moves.
+    """
+    def __init__(self, length, height, seed, char_dict=None):
+        """
+        Starts a new terminal_snake.Game of LengthxHeight with seed.
+        Assumes seed is an integer from 0 to 2**64-1.
+        """
+        self.length = length
+        self.height = height
+        self.seed = seed
+        self.game = ts.Game(length, height, char_dict, seed)
+        self.moves = bytearray()
+
+
+    def step(self, new_dir=None):
+        """
+        Same as Game.step, but also records the move.
+        Returns True if the game is over, False otherwise.
+        """
+        over = self.game.step(new_dir)
+
+        # The direction the snake really moved to. So None and 180 degree
+        # turns are stored as the direction they turned into.
+        i = self.game.steps - 1
+        code = DIRECTIONS.index(self.game.snake.snake_body[0][1])
+        if i % 4 == 0:
+            self.moves.append(code)
+        else:
+            self.moves[-1] |= code << (i % 4 * 2)
+
+        return over
+
+
+    def to_bytes(self):
+        """
+        Returns the replay record of the game so far.
+        """
+        game = self.game
+        header = HEADER.pack(MAGIC, VERSION, CRASHES.index(game.crash), game.won,
+                             self.length, self.height, self.seed, game.steps, game.f_eaten)
+        return header + bytes(self.moves)
+
+
+    def write(self, file):
+        """
+        Assumes file is a file opened in binary mode.
+        Writes the replay record to the end of it.
+        """
+        file.write(self.to_bytes())
+
+
+
+class Replay:
+    """
+    A replay record. It is read from a buffer, such as bytes or an mmap,
+    and the moves are decoded only when they are needed.
+    """
+    def __init__(self, buffer, offset=0):
+        """
+        Reads the header of the record at offset of buffer.
+        Raises a ValueError if it isn't a replay record.
+        """
+        if len(buffer) - offset < HEADER.size:
+            raise ValueError('Replay record is cut short.')
+        (magic, version, crash, won, self.length, self.height,
+         self.seed, self.steps, self.f_eaten) = HEADER.unpack_from(buffer, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a replay record.')
+        self.crash = CRASHES[crash]
+        self.won = bool(won)
+
+        self.buffer = buffer
+        self.moves_offset = offset + HEADER.size
+        self.size = HEADER.size + packed_size(self.steps)
+        if len(buffer) - offset < self.size:
+            raise ValueError('Replay record is cut short.')
+
+
+    def moves(self):
+        """
+        Returns the moves as a string of r,l,u,d.
+        """
+        data = self.buffer[self.moves_offset:self.moves_offset+packed_size(self.steps)]
+        return ''.join([DECODED_BYTES[byte] for byte in data])[:self.steps]
+
+
+    def validate(self):
+        """
+        Plays the replay again, and returns True if it ends with the
+        same steps, fruits, crash and win as it is recorded. False otherwise.
+        """
+        player = ReplayPlayer(self, snapshot_every=0)
+        game = player.seek(self.steps)
+        return (game.steps == self.steps and game.f_eaten == self.f_eaten
+                and game.crash == self.crash and game.won == self.won)
+
+
+
+class ReplayPlayer:
+    """
+    Plays a replay again, step by step or from any step.
+    """
+    def __init__(self, replay, snapshot_every=SNAPSHOT_EVERY, char_dict=None):
+        """
+        Assumes replay is a Replay object.
+        The game is copied every snapshot_every steps, 0 for never.
+        """
+        self.replay = replay
+        self.moves = replay.moves()
+        self.snapshot_every = snapshot_every
+        self.char_dict = char_dict
+
+        self.game = ts.Game(replay.length, replay.height, char_dict, replay.seed)
+        self.snapshots = {0: self.game.fork()}
+        # snapshots stores copies of the game by their steps.
+
+
+    def step(self):
+        """
+        Plays the next move. Returns True if the game is over, False otherwise.
+        Raises a ValueError if there isn't any move left.
+        """
+        game = self.game
+        if game.steps >= len(self.moves):
+            raise ValueError('Replay is over.')
+
+        over = game.step(self.moves[game.steps])
+        if self.snapshot_every and game.steps % self.snapshot_every == 0:
+            self.snapshots.setdefault(game.steps, game.fork())
+        return over
+
+
+    def seek(self, k):
+        """
+        Plays the game until step k, starting from the closest snapshot
+        if k is before the current step. Returns the Game object.
+        """
+        k = min(k, len(self.moves))
+        if k < self.game.steps:
+            start = max(steps for steps in self.snapshots if steps <= k)
+            self.game = self.snapshots[start].fork()
+
+        while self.game.steps < k and not self.game.over:
+            self.step()
+        return self.game
+
+
+
+class ReplayArchive:
+    """
+    A file of replay records, one after another, read with mmap.
+    """
+    def __init__(self, path):
+        """
+        Opens the archive at path.
+        """
+        self.file = open(path, 'rb')
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap can't map an empty file.
+            self.buffer = b''
+
+
+    def __iter__(self):
+        """
+        Yields the Replay objects in the archive. Only their headers are read.
+        """
+        offset = 0
+        while offset < len(self.buffer):
+            replay = Replay(self.buffer, offset)
+            yield replay
+            offset += replay.size
+
+
+    def validate(self):
+        """
+        Yields the index of every replay in the archive, and whether it's valid.
+        """
+        for i, replay in enumerate(self):
+            yield i, replay.validate()
+
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+
+if __name__ == '__main__':
+    # Validates the archives given as arguments.
+    invalid = 0
+    for path in sys.argv[1:]:
+        with ReplayArchive(path) as archive:
+            for i, valid in archive.validate():
+                if not valid:
+                    invalid += 1
+                    print(f'{path}: replay {i} is invalid.')
+    print(f'{invalid} invalid replays.')
+    sys.exit(1 if invalid else 0)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of saving and loading the whole state of a game.
+Such as the size of the grid, the snake, the fruits, the counters and
+the random state, so a loaded game goes on exactly like the saved one.
+
+A saved state is a header, the random state, the fruits and the snake.
+Snake is stored as its head and the directions of its sections, 2 bits each,
+like the moves of snake_replay. Each section is one step away from the next
+one, in the opposite of its direction. Free coordinates aren't stored, new
+fruits are chosen only by the taken coordinates and the random state, see
+Occupancy.random_free. So a state takes bytes by the length of the snake,
+not by the size of the grid.
+To copy a game in memory, Game.fork is faster.
+"""
+
+
+import random
+import struct
+from collections import deque
+
+import terminal_snake as ts
+from snake_replay import CRASHES, DECODED_BYTES, DIRECTIONS, packed_size
+
+
+MAGIC = b'SNKS'
+VERSION = 2
+# 1 also stored the free coordinates, in the order fruits were chosen from.
+
+HEADER = struct.Struct('<4sBBBxIIIIIIiiI')
+# magic, version, crash, won, length, height, steps, f_eaten, growth,
+# snake_len, head x, head y, number of fruits
+# over isn't stored, a game is over if it crashed or won.
+
+RANDOM_STATE = struct.Struct('<I625IBd')
+# Version and the 624 words of the Mersenne Twister of random.Random,
+# the position in them, whether there is a saved gauss, and the gauss.
+
+FRUIT = struct.Struct('<II')
+
+SAVE_FILE = 'snake_save.bin'
+
+
+
+def to_bytes(game):
+    """
+    Assumes game is a terminal_snake.Game object.
+    Returns the saved state of it.
+    """
+    snake = game.snake
+    head_x, head_y = snake.coords_list[0]
+    header = HEADER.pack(MAGIC, VERSION, CRASHES.index(game.crash), game.won,
+                         game.grid.grid_area[0], game.grid.grid_area[1], game.steps,
+                         game.f_eaten, snake.growth, snake.snake_len, head_x, head_y,
+                         len(game.f_list))
+
+    version, words, gauss = game.rng.getstate()
+    random_state = RANDOM_STATE.pack(version, *words, gauss is not None, gauss or 0.0)
+
+    fruits = b''.join(FRUIT.pack(*fruit.coords_list[0]) for fruit in game.f_list)
+
+    # 4 directions in a byte, the first one in the lowest 2 bits.
+    codes = [DIRECTIONS.index(sect[1]) for sect in snake.snake_body]
+    codes.extend([0] * (-len(codes) % 4))
+    body = bytes([codes[i] | codes[i+1] << 2 | codes[i+2] << 4 | codes[i+3] << 6
+                  for i in range(0, len(codes), 4)])
+
+    return header + random_state + fruits + body
+
+
+def from_bytes(data, char_dict=None):
+    """
+    Returns the terminal_snake.Game object of a saved state.
+    char_dict is passed to the Grid.
+    Raises a ValueError if data isn't a saved state.
+    """
+    if len(data) < HEADER.size + RANDOM_STATE.size:
+        raise ValueError('Saved state is cut short.')
+    (magic, version, crash, won, length, height, steps, f_eaten, growth,
+     snake_len, head_x, head_y, fruits) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a saved state.')
+    offset = HEADER.size
+
+    random_state = RANDOM_STATE.unpack_from(data, offset)
+    offset += RANDOM_STATE.size
+    gauss = random_state[-1] if random_state[-2] else None
+
+    if len(data) < offset + fruits*FRUIT.size + packed_size(snake_len):
+        raise ValueError('Saved state is cut short.')
+    fruit_coords = [FRUIT.unpack_from(data, offset + i * FRUIT.size) for i in range(fruits)]
+    offset += fruits * FRUIT.size
+
+    moves = ''.join([DECODED_BYTES[byte] for byte in data[offset:offset+packed_size(snake_len)]])
+    directions = moves[:snake_len]
+
+    # Walking back from the head. A section was entered by moving in its direction,
+    # so the next section is one step behind it.
+    sections = [(head_x, head_y)]
+    x, y = head_x, head_y
+    for new_dir in directions[:-1]:
+        step_x, step_y = ts.DIRECTION_STEPS[new_dir]
+        x, y = x - step_x, y - step_y
+        sections.append((x, y))
+
+    # Game.__init__ spawns a new snake, so the game is put together here.
+    game = ts.Game.__new__(ts.Game)
+    game.rng = random.Random()
+    game.rng.setstate((random_state[0], random_state[1:626], gauss))
+    game.grid = ts.Grid(length, height, char_dict, game.rng)
+    occupancy = game.grid.occupancy
+
+    snake = ts.Snake(*sections, occupancy=occupancy)
+    snake.snake_body = deque(zip(sections, directions))
+    snake.growth = growth
+    snake.occupy_space()
+    game.snake = snake
+    game.s_list = [snake]
+
+    game.f_list = []
+    for coords in fruit_coords:
+        fruit = ts.Fruit(coords, occupancy=occupancy)
+        fruit.occupy_space()
+        game.f_list.append(fruit)
+
+    game.f_eaten = f_eaten
+    game.steps = steps
+    game.crash = CRASHES[crash]
+    game.won = bool(won)
+    game.over = game.crash is not None or game.won
+    return game
+
+
+def save(game, path=SAVE_FILE):
+    """
+    Writes the saved state of game to the file at path.
+    """
+    with open(path, 'wb') as file:
+        file.write(to_bytes(game))
+
+
+def load(path=SAVE_FILE, char_dict=None):
+    """
+    Returns the game saved to the file at path.
+    """
+    with open(path, 'rb') as file:
+        return from_bytes(file.read(), char_dict)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+This file consists of a runner that plays many seeded games with a
+movement policy, on all the cores, and collects their stats.
+
+A policy is a function that takes a terminal_snake.Game and returns the
+next direction of the snake, one of r,l,u,d, or None to keep going.
+Because the games are played in other processes, it should be a function
+defined at the top level of a module, so it can be pickled.
+"""
+
+
+import argparse
+import importlib
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import terminal_snake as ts
+
+
+MAX_STEPS_PER_CELL = 10
+# Games are stopped after (length*height) * MAX_STEPS_PER_CELL steps by default.
+# Or a snake that goes round in circles would never end its game.
+
+
+
+class TournamentStats:
+    """
+    Sums of the stats of the played games.
+    Such as steps survived, fruit eaten and wins.
+    """
+    def __init__(self):
+        self.games = 0
+        self.steps = 0
+        self.f_eaten = 0
+        self.wins = 0
+        self.crashes = {'wall': 0, 'self': 0, None: 0}
+        # Number of games by their crash reason. None is for the games that
+        # didn't crash, which are won or stopped at the step limit.
+        self.max_steps = 0
+        self.max_f_eaten = 0
+
+
+    def add_game(self, game):
+        """
+        Assumes game is a terminal_snake.Game object.
+        Adds its stats.
+        """
+        self.games += 1
+        self.steps += game.steps
+        self.f_eaten += game.f_eaten
+        self.wins += game.won
+        self.crashes[game.crash] += 1
+        self.max_steps = max(self.max_steps, game.steps)
+        self.max_f_eaten = max(self.max_f_eaten, game.f_eaten)
+
+
+    def add_stats(self, other):
+        """
+        Assumes other is a TournamentStats object.
+        Adds its sums to these.
+        """
+        self.games += other.games
+        self.steps += other.steps
+        self.f_eaten += other.f_eaten
+        self.wins += other.wins
+        for reason, number in other.crashes.items():
+            self.crashes[reason] += number
+        self.max_steps = max(self.max_steps, other.max_steps)
+        self.max_f_eaten = max(self.max_f_eaten, other.max_f_eaten)
+
+
+    def win_rate(self):
+        """
+        Returns the ratio of won games, 0 if no game is played.
+        """
+        return self.wins / self.games if self.games else 0.0
+
+
+    def summary(self):
+        """
+        Returns the stats as a line of text.
+        """
+        games = self.games or 1
+        return (f'{self.games} games, {self.steps/games:.1f} steps and '
+                f'{self.f_eaten/games:.2f} fruit per game, win rate {self.win_rate():.2%}, '
+                f'crashes: {self.crashes["wall"]} wall, {self.crashes["self"]} self')
+
+
+
+def play_game(policy, seed, length, height, max_steps=None):
+    """
+    Plays a game of LengthxHeight with seed, moving the snake with policy.
+    Stops after max_steps steps, (length*height) * MAX_STEPS_PER_CELL if None.
+    Returns the Game object.
+    """
+    if max_steps is None:
+        max_steps = length * height * MAX_STEPS_PER_CELL
+
+    game = ts.Game(length, height, seed=seed)
+    while not game.over and game.steps < max_steps:
+        game.step(policy(game))
+    return game
+
+
+def play_games(policy, seeds, length, height, max_steps=None):
+    """
+    Plays a game for every seed in seeds, and returns a TournamentStats object.
+    This is what every worker process runs.
+    """
+    stats = TournamentStats()
+    for seed in seeds:
+        stats.add_game(play_game(policy, seed, length, height, max_steps))
+    return stats
+
+
+def run_tournament(policy, seeds, length, height, max_steps=None, workers=None, chunk_size=64):
+    """
+    Plays a game for every seed in seeds on a pool of workers processes,
+    os.cpu_count() if None. Seeds are sent in chunks of chunk_size, so the
+    processes spend their time on playing, instead of talking to each other.
+    Yields the TournamentStats of all the finished games, after each chunk.
+    """
+    seeds = list(seeds)
+    chunks = [seeds[i:i+chunk_size] for i in range(0, len(seeds), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    total = TournamentStats()
+    if workers == 1:
+        for chunk in chunks:
+            total.add_stats(play_games(policy, chunk, length, height, max_steps))
+            yield total
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(play_games, policy, chunk, length, height, max_steps)
+                   for chunk in chunks]
+        for future in as_completed(futures):
+            total.add_stats(future.result())
+            yield total
+
+
+
+def greedy_policy(game):
+    """
+    An example policy. Goes towards the fruit, if it can do it without
+    crashing at once. Otherwise takes any safe direction, if there is any.
+    """
+    snake = game.snake
+    head_x, head_y = snake.coords_list[0]
+    length, height = game.grid.grid_area
+    occupancy = game.grid.occupancy
+    tail = snake.coords_list[-1]
+
+    def is_safe(new_dir):
+        step_x, step_y = ts.DIRECTION_STEPS[new_dir]
+        coords = (head_x + step_x, head_y + step_y)
+        if not (0 <= coords[0] < length and 0 <= coords[1] < height):
+            return False
+        # The tail moves away, unless the snake is growing.
+        if coords == tail and not snake.growth:
+            return True
+        if occupancy.is_taken(coords):
+            return any(coords == fruit.coords_list[0] for fruit in game.f_list)
+        return True
+
+    old_dir = snake.snake_body[0][1]
+    choices = [d for d in 'rlud' if d != ts.OPPOSITE_DIRECTIONS[old_dir]]
+
+    if game.f_list:
+        fruit_x, fruit_y = game.f_list[0].coords_list[0]
+        # Directions that make the snake closer to the fruit come first.
+        choices.sort(key=lambda d: abs(fruit_x - head_x - ts.DIRECTION_STEPS[d][0]) +
+                                   abs(fruit_y - head_y - ts.DIRECTION_STEPS[d][1]))
+    else:
+        choices.sort(key=lambda d: d != old_dir)
+
+    for new_dir in choices:
+        if is_safe(new_dir):
+            return new_dir
+    return None
+
+
+def load_policy(name):
+    """
+    Returns the policy with name, given as 'module:function'.
+    """
+    module_name, _, function_name = name.partition(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plays seeded games with a policy on all the cores.')
+    parser.add_argument('policy', nargs='?', default='snake_tournament:greedy_policy',
+                        help="policy as 'module:function' (default: %(default)s)")
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--length', type=int, default=20)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--max-steps', type=int, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    seeds = range(args.first_seed, args.first_seed + args.games)
+    for stats in run_tournament(load_policy(args.policy), seeds, args.length, args.height,
+                                args.max_steps, args.workers):
+        print(stats.summary(), end='\r')
+    print()
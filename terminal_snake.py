@@ -9,23 +9,48 @@ This file consists of classes and functions for the game
 
 
 import random
+from bisect import bisect_right
+from collections import deque
+from itertools import accumulate, filterfalse, islice, repeat
+
+
+DIRECTION_STEPS = {'r': (1, 0), 'l': (-1, 0), 'u': (0, -1), 'd': (0, 1)}
+# How much x and y change when moving one step in a direction.
+# Keep in mind that the x-axis increases to right and y-axis increases to down.
+
+OPPOSITE_DIRECTIONS = {'r': 'l', 'l': 'r', 'u': 'd', 'd': 'u'}
+# Snake cannot turn to the opposite of its direction.
+
+SPAWN_EVERY = 5
+# A fruit is spawned every this many steps, if there isn't any other fruit.
+
+DEFAULT_CHAR_DICT = {'head_u': '^', 'head_d': 'v',
+                     'head_l': '<', 'head_r': '>',
+                     'tail_u': '|', 'tail_d': '|',
+                     'tail_l': '-', 'tail_r': '-',
+                     'empty': '*', 'fruit': 'p'}
+# Plain symbols for the game, used when no other char_dict is given.
 
 
 class Grid:
     """
     Class for the game area.
     """
-    def __init__(self, length, height, char_dict):
+    def __init__(self, length, height, char_dict=None, rng=None):
         """
         Class for the game area.
         Assumes LengthxHeight is size of the area.
-        char_dict is a dict that stores the symbols for the game.
+        char_dict is a dict that stores the symbols for the game, DEFAULT_CHAR_DICT if None.
+        rng is a random.Random object that chooses the coordinates of new objects.
+        If it is None, the random module is used.
         """
         # Because length and height give the size, they should start from 1, instead of 0.
         if length < 3 or height < 3:  # Or there wouldn't be enough space for the snake
             raise ValueError('All arguments should be greater or equal to 3.')
         self.grid_area = (length, height)
         
+        if char_dict is None:
+            char_dict = DEFAULT_CHAR_DICT
         self.char_dict = char_dict
         # char_dict example:
         # ct1 = {'head_u': '^', 'head_d': 'v',
@@ -33,6 +58,8 @@ class Grid:
         #        'tail_u': '|', 'tail_d': '|',
         #        'tail_l': '-', 'tail_r': '-',
         #        'empty': '*', 'fruit': 'p'}
+
+        self.rng = random if rng is None else rng
         
         self.empty_grid_list = []
         self.create_empty_grid_list()
@@ -43,18 +70,23 @@ class Grid:
         # First, a swallow (and deep) copy of empty_grid_list is created.
         # Then game objects, such as snake and fruit, will be placed on it.
 
+        self.occupancy = Occupancy(self.grid_area)
+        # Each grid has its own occupancy, so many games can be played side by side.
+        # It also keeps the free coordinates of the grid.
+        # Objects spawned by the grid are on this occupancy.
+
 
     def spawn_new_snake(self):
         """
         Returns a new snake object. Its section coordinates are chosen
         randomly and of course, next to each other.
         """
-        head_x = random.randint(1, self.grid_area[0]-2)
-        head_y = random.randint(1, self.grid_area[1]-2)
+        head_x = self.rng.randint(1, self.grid_area[0]-2)
+        head_y = self.rng.randint(1, self.grid_area[1]-2)
         # Choosing a random coordinate for the snakes head.
 
         # Then choosing another coordinate next to head.
-        tail_coords = random.choice(((head_x-1, head_y), 
+        tail_coords = self.rng.choice(((head_x-1, head_y), 
                                     (head_x+1, head_y), 
                                     (head_x, head_y-1), 
                                     (head_x, head_y+1)))
@@ -63,18 +95,53 @@ class Grid:
         tail_y = tail_coords[1]
 
         # Creating a snake object.
-        return Snake((head_x, head_y), (tail_x, tail_y))
+        return Snake((head_x, head_y), (tail_x, tail_y), occupancy=self.occupancy)
 
 
     def spawn_fruit(self):
         """
         Returns a fruit object. Its coordinates are chosen randomly
-        from the grid.
+        from the free coordinates of the grid, borders included.
+        Returns None if there is no free coordinate left.
         """
-        fruit_x = random.randint(1, self.grid_area[0]-2)
-        fruit_y = random.randint(1, self.grid_area[1]-2)
+        coords = self.occupancy.random_free(self.rng)
+        if coords is None:
+            return None
         
-        return Fruit((fruit_x, fruit_y))
+        return Fruit(coords, occupancy=self.occupancy)
+
+
+    def is_full(self):
+        """
+        Returns True if game objects take as many coordinates as the grid has, False otherwise.
+        This is equal to covering every coordinate over the grid.
+        """
+        return self.occupancy.occupied_number() >= self.grid_area[0]*self.grid_area[1]
+
+
+    def is_intersect(self, new_coords_list):
+        """
+        Returns True if any coordinate from new_coords_list is taken
+        on this grid, False otherwise.
+        """
+        return self.occupancy.is_intersect(new_coords_list)
+
+
+    def fork(self, rng=None):
+        """
+        Returns a copy of the grid, with a copy of its occupancy.
+        rng is the random object of the copy, the same one if None.
+        Objects on the grid should be forked onto the new occupancy, see GameObject.fork.
+        """
+        grid = Grid.__new__(Grid)
+        grid.grid_area = self.grid_area
+        grid.char_dict = self.char_dict
+        grid.rng = self.rng if rng is None else rng
+        grid.empty_grid_list = self.empty_grid_list
+        # empty_grid_list is only copied from, never changed. So it is shared.
+        grid.grid_list = []
+        grid.occupancy = self.occupancy.copy()
+        return grid
 
 
     def create_empty_grid_list(self):
@@ -121,7 +188,7 @@ class Grid:
         head_symbol = self.char_dict['head_'+head_dir]
         add_to_grid(head_x, head_y, head_symbol)
         
-        for sect in snake.snake_body[1:]:
+        for sect in islice(snake.snake_body, 1, None):
             sect_x, sect_y = sect[0][0], sect[0][1]
             # *_dir is either r,l,u,d
             sect_dir = sect[1]
@@ -144,9 +211,10 @@ class Grid:
         self.grid_list[y][x] = symbol
 
 
-    def print_grid_list(self):
+    def print_grid_list(self, file=None):
         """
         Print the grid_list as a string.
+        It is printed to file, if it's given. Otherwise to the screen.
         """
         res = ''
 
@@ -155,7 +223,7 @@ class Grid:
             res += ''.join(row)
             res += '\n'
 
-        print(res, end='')
+        print(res, end='', file=file)
 
 
     def run_grid(self, snakes_iter, fruits_iter):
@@ -178,54 +246,400 @@ class Grid:
 
        
 
+class Game:
+    """
+    Rules of the game, around a Grid, a Snake and Fruits.
+    It doesn't take any input, print or wait. So it can be played
+    as fast as possible, by bots or tests, without a terminal.
+    """
+    def __init__(self, length, height, char_dict=None, seed=None):
+        """
+        Starts a new game on a LengthxHeight grid.
+        char_dict is passed to the Grid. seed is for the random.Random object
+        that chooses the coordinates, so same seed and same moves make the same game.
+        """
+        self.rng = random.Random(seed)
+        self.grid = Grid(length, height, char_dict, self.rng)
+
+        self.snake = self.grid.spawn_new_snake()
+        self.snake.occupy_space()
+        self.s_list = [self.snake]
+        self.f_list = []
+
+        self.f_eaten = 0
+        self.steps = 0
+        # f_eaten == number of fruits eaten. Each step is a call of step.
+
+        self.over = False
+        self.won = False
+        self.crash = None
+        # crash is why the game is over. 'wall' if the snake went out of the grid,
+        # 'self' if it crashed to itself and None if it didn't crash.
+
+
+    def fork(self):
+        """
+        Returns a copy of the game, which can be played on without changing this one.
+        Same moves make the same game on both, the random state is copied too.
+        Much faster than copy.deepcopy, so bots can try many moves ahead.
+        """
+        game = Game.__new__(Game)
+        game.rng = random.Random()
+        game.rng.setstate(self.rng.getstate())
+        game.grid = self.grid.fork(game.rng)
+
+        occupancy = game.grid.occupancy
+        game.snake = self.snake.fork(occupancy)
+        game.s_list = [game.snake]
+        game.f_list = [fruit.fork(occupancy) for fruit in self.f_list]
+
+        game.f_eaten = self.f_eaten
+        game.steps = self.steps
+        game.over = self.over
+        game.won = self.won
+        game.crash = self.crash
+        return game
+
+
+    def step(self, new_dir=None):
+        """
+        Assumes new_dir is one of r,l,u,d or None.
+        Moves the snake, spawns fruit, and checks for crashes and eating.
+        None or a 180 degree turn keeps the direction of the snake.
+        Returns True if the game is over, False otherwise.
+        """
+        if self.over:
+            raise ValueError('Game is over.')
+
+        snake = self.snake
+        grid = self.grid
+
+        # Snake can only turn by 90 degrees. Snake cannot and will not do any 180 turns.
+        old_dir = snake.snake_body[0][1]
+        if new_dir is None or new_dir == OPPOSITE_DIRECTIONS[old_dir]:
+            new_dir = old_dir
+
+        snake.move_snake(new_dir)
+        self.steps += 1
+
+        # Spawn a fruit every 5 steps if there isn't any other fruit.
+        if self.steps % SPAWN_EVERY == 0 and not self.f_list:
+            fruit = grid.spawn_fruit()
+            if fruit is not None:
+                self.f_list.append(fruit)
+                fruit.occupy_space()
+
+        # If snake crash, then game over.
+        # The snake and the fruits are the only objects on the grid. So if anything
+        # other than the head and a fruit is on the head, it is a tail section.
+        # This doesn't walk the whole body, like snake.is_head_tail_crash does.
+        head = snake.coords_list[0]
+        fruits_on_head = sum(fruit.coords_list[0] == head for fruit in self.f_list)
+        if snake.out_of_grid(grid):
+            self.crash = 'wall'
+        elif grid.occupancy.cells[head] - fruits_on_head > 1:
+            self.crash = 'self'
+        
+        # If there is no space left to move, than also game over.
+        # This is equal to covering every coordinate over the grid,
+        # which is, infact, really hard. It's a victory.
+        if self.crash is not None or grid.is_full():
+            self.over = True
+            self.won = grid.is_full()
+            return True
+
+        # Eats the fruit and grows the snake, if head and fruit are on the same coordinates.
+        for fruit in self.f_list:
+            if snake.eat_fruit(fruit):
+                self.f_eaten += 1
+                self.f_list.remove(fruit)
+                snake.grow_snake()
+                break
+
+        return False
+
+
+
+class Occupancy:
+    """
+    Index of the coordinates taken by game objects.
+    Keeps every registered coords_list by object index, and also counts
+    how many objects are sitting on each coordinate. So the usual questions,
+    is this coordinate taken or how many coordinates are taken, don't need
+    to look through every object.
+    """
+    def __init__(self, area=None):
+        """
+        If area is given as (length, height), the free coordinates of it are kept.
+        """
+        self.objects = {}
+        # objects stores the coords_list of every registered object, by obj_index.
+        # This is what GameObject.occupied_coordinates used to be.
+
+        self.cells = {}
+        # cells stores how many objects are on a coordinate.
+        # Example: {(1, 1): 1, (1, 2): 1, (4, 3): 1}
+        # Coordinates that aren't taken are not in the dict at all.
+
+        self.total = 0
+        # Sum of all counts in cells, kept up to date so it doesn't have to be summed.
+
+        self.area = None
+        self.row_free = []
+        self.free_number = 0
+        # If the size of the area is set with reset, row_free stores how many
+        # coordinates of each row of it aren't taken, and free_number all of them.
+        # A free coordinate is only a number less, so a copy or a saved game doesn't
+        # need the free coordinates, they are found from cells when one is picked.
+
+        self.changed = None
+        # If this is set to a set, every coordinate that gets taken or left
+        # free is added to it. Renderers use it to know what to draw again.
+
+        self.next_index = 0
+        # Objects get their obj_index from this counter, so no two objects
+        # ever get the same index, even after some of them are removed.
+
+        self.reset(area)
+
+
+    def new_index(self):
+        """
+        Returns a new object index.
+        """
+        i = self.next_index
+        self.next_index += 1
+        return i
+
+
+    def reset(self, area=None):
+        """
+        Empties the occupancy. If area is given as (length, height),
+        starts keeping the free coordinates of that area.
+        """
+        self.objects.clear()
+        self.cells.clear()
+        self.total = 0
+
+        self.area = area
+        if area is None:
+            self.row_free = []
+        else:
+            self.row_free = [area[0]] * area[1]
+        self.free_number = sum(self.row_free)
+
+
+    def copy(self):
+        """
+        Returns a copy of the occupancy. Registered coords_lists aren't copied,
+        the objects should register their own copies, see GameObject.fork.
+        changed isn't copied, it belongs to the renderer of this one.
+        """
+        occupancy = Occupancy.__new__(Occupancy)
+        occupancy.objects = self.objects.copy()
+        occupancy.cells = self.cells.copy()
+        occupancy.total = self.total
+        occupancy.area = self.area
+        occupancy.row_free = self.row_free.copy()
+        occupancy.free_number = self.free_number
+        occupancy.changed = None
+        occupancy.next_index = self.next_index
+        return occupancy
+
+
+    def claim(self, coords):
+        """
+        Marks one more object on coords.
+        """
+        cells = self.cells
+        count = cells.get(coords, 0)
+        cells[coords] = count + 1
+        self.total += 1
+
+        if not count:
+            if self.changed is not None:
+                self.changed.add(coords)
+
+            # It was free until now, if it's in the area.
+            area = self.area
+            if area is not None and 0 <= coords[0] < area[0] and 0 <= coords[1] < area[1]:
+                self.row_free[coords[1]] -= 1
+                self.free_number -= 1
+
+
+    def release(self, coords):
+        """
+        Marks one less object on coords.
+        """
+        cells = self.cells
+        count = cells[coords] - 1
+        if count:
+            cells[coords] = count
+        else:
+            del cells[coords]
+            if self.changed is not None:
+                self.changed.add(coords)
+
+            # It is free now, if it's in the area.
+            area = self.area
+            if area is not None and 0 <= coords[0] < area[0] and 0 <= coords[1] < area[1]:
+                self.row_free[coords[1]] += 1
+                self.free_number += 1
+        self.total -= 1
+
+
+    def random_free(self, rng):
+        """
+        Assumes rng is a random.Random object or the random module.
+        Returns a random free coordinate of the area, or None if there isn't any.
+        The k-th free coordinate is picked, counting the rows from the top and
+        each row from the left, like snake_batch does. So which one is picked
+        only depends on the taken coordinates and rng.
+        Takes time by the length and the height of the area, not by its size.
+        """
+        if not self.free_number:
+            return None
+        k = rng.randrange(self.free_number)
+
+        # Row of the k-th free coordinate, where the count of free ones passes k.
+        counts = list(accumulate(self.row_free))
+        y = bisect_right(counts, k)
+        if y:
+            k -= counts[y-1]
+
+        # Then the k-th free coordinate of the row. Coordinates are looked up
+        # by filterfalse, instead of a loop, which is a few times faster.
+        row = zip(range(self.area[0]), repeat(y))
+        return next(islice(filterfalse(self.cells.__contains__, row), k, None))
+
+
+    def register(self, i, coords_list):
+        """
+        Registers coords_list for the object with index i.
+        If the object was registered before, its old coordinates are released first.
+        """
+        if i in self.objects:
+            self.unregister(i)
+
+        self.objects[i] = coords_list
+        for coords in coords_list:
+            self.claim(coords)
+
+
+    def unregister(self, i):
+        """
+        Removes the object with index i, releasing its coordinates.
+        """
+        for coords in self.objects.pop(i):
+            self.release(coords)
+
+
+    def is_taken(self, coords):
+        """
+        Returns True if any object is on coords, False otherwise.
+        """
+        return coords in self.cells
+
+
+    def is_intersect(self, new_coords_list):
+        """
+        Returns True if any coordinate from new_coords_list is taken, False otherwise.
+        """
+        cells = self.cells
+        for new_coord in new_coords_list:
+            if new_coord in cells:
+                return True
+        return False
+
+
+    def occupied_number(self):
+        """
+        Returns the number of occupied coordinates.
+        A coordinate with two objects on it is counted twice.
+        """
+        return self.total
+
+
+    def taken_number(self):
+        """
+        Returns the number of different coordinates that are taken.
+        """
+        return len(self.cells)
+
+
+
 class GameObject:
     """
-    Class for game objects. Parent of Snake and Fruit. occupied_coordinates dictionary 
-    is its most important part. This dictionary stores coordinates of in-game objects.
+    Class for game objects. Parent of Snake and Fruit. occupancy is
+    its most important part. This Occupancy object stores coordinates of in-game objects.
+    Objects spawned by a Grid are on the occupancy of that grid. Others are on
+    the occupancy of the class, which all of them share.
     """
-    occupied_coordinates = {}
-    # This dict stores all the coordinates of game objects.
+    occupancy = Occupancy()
+    occupied_coordinates = occupancy.objects
+    # This dict stores all the coordinates of the game objects on the shared occupancy.
+    # It is the same dict as occupancy.objects, kept under its old name.
     
-    def __init__(self):
-        self.obj_index = len(GameObject.occupied_coordinates)
+    def __init__(self, occupancy=None):
+        if occupancy is not None:
+            self.occupancy = occupancy
+        self.obj_index = self.occupancy.new_index()
 
 
     def occupy_space(self):
-        i = self.obj_index
-        GameObject.occupied_coordinates[i] = self.coords_list
+        self.occupancy.register(self.obj_index, self.coords_list)
 
 
     def empty_space(self):
-        i = self.obj_index
-        GameObject.occupied_coordinates.pop(i)
+        self.occupancy.unregister(self.obj_index)
 
 
-    def update_space(self):
+    def update_space(self, added=(), removed=()):
+        """
+        Updates occupied coordinates after coords_list is changed.
+        If added and removed coordinates are given, only they are updated.
+        Otherwise whole coords_list is registered again.
+        """
         i = self.obj_index
-        GameObject.occupied_coordinates[i] = self.coords_list
+        occupancy = self.occupancy
+        
+        if (added or removed) and i in occupancy.objects:
+            for coords in removed:
+                occupancy.release(coords)
+            for coords in added:
+                occupancy.claim(coords)
+            occupancy.objects[i] = self.coords_list
+        else:
+            occupancy.register(i, self.coords_list)
+
+
+    def fork(self, occupancy):
+        """
+        Assumes occupancy is a copy of the occupancy of this object, see Occupancy.copy.
+        Returns a copy of the object on it, with its own coords_list.
+        """
+        obj = object.__new__(type(self))
+        obj.__dict__.update(self.__dict__)
+        obj.coords_list = self.coords_list.copy()
+        obj.occupancy = occupancy
+        if obj.obj_index in occupancy.objects:
+            occupancy.objects[obj.obj_index] = obj.coords_list
+        return obj
     
     
     # Checks if any coordinate from the given coords_list already exists in the
-    # occupied_coordinates dictionary.
+    # occupied_coordinates dictionary, of the shared occupancy.
     @classmethod
     def is_intersect(cls, new_coords_list):
-        for new_coord in new_coords_list:
-            for occu_list in GameObject.occupied_coordinates.values():
-                if new_coord in occu_list:
-                    return True
-        return False
+        return GameObject.occupancy.is_intersect(new_coords_list)
     
     
     @classmethod
     def occupied_number(cls):
         """
-        Returns the number of occupied coordinates.
+        Returns the number of occupied coordinates, on the shared occupancy.
         """
-        num = 0
-        for occu_list in GameObject.occupied_coordinates.values():
-            num += len(occu_list)
-        
-        return num
+        return GameObject.occupancy.occupied_number()
     
 
 
@@ -233,28 +647,37 @@ class Snake(GameObject):
     """
     Snake, the main protagonist of the game.
     """
-    def __init__(self, *sections_coords):
+    def __init__(self, *sections_coords, occupancy=None):
         """
         Snake, the main protagonist of the game.
         Assumes Snake object is instanced with at least 2 coordinate tuples.
         Raises a ValueError instead.
+        occupancy is the Occupancy object it will be on, the shared one if None.
         """
         # It should be at least 2 sections long to be created.
         if len(sections_coords) < 2:
             raise ValueError
 
-        # A list that contains coordinates of sections.
-        self.coords_list = list(sections_coords)
-        GameObject.__init__(self)
+        # A deque that contains coordinates of sections, head first.
+        self.coords_list = deque(sections_coords)
+        GameObject.__init__(self, occupancy)
         
         self.snake_len = len(sections_coords)
 
-        # snake_body is a list that contains information about its sections.
-        # Example: [((1, 1), 'l')((1, 2), 'l')]
+        self.growth = 0
+        # Number of sections the snake still has to grow.
+        # Each move keeps the tail in place instead of popping it, until this is 0.
+
+        self.moves = 0
+        # Number of moves made. Renderers use it to know how many new heads
+        # to draw, when a frame is drawn after more than one move.
+
+        # snake_body is a deque that contains information about its sections.
+        # Example: deque([((1, 1), 'l'), ((1, 2), 'l')])
         # r, l, u, d are directions. 
         # Keep in mind that the x-axis increases to right and
         # y-axis increases to down.
-        self.snake_body = []
+        self.snake_body = deque()
         
         # Setting directions and sections for coordinates
         for i in range(self.snake_len-1):
@@ -297,10 +720,16 @@ class Snake(GameObject):
         """
         Resets coords_list from snake_body
         """
-        self.coords_list = []
+        self.coords_list = deque(sect[0] for sect in self.snake_body)
 
-        for sect in self.snake_body:
-            self.coords_list.append(sect[0])
+
+    def fork(self, occupancy):
+        """
+        Same as GameObject.fork, also copies snake_body.
+        """
+        snake = GameObject.fork(self, occupancy)
+        snake.snake_body = self.snake_body.copy()
+        return snake
 
            
     def move_snake(self, new_dir):
@@ -308,61 +737,36 @@ class Snake(GameObject):
         Assumes new_dir is one of r,l,u,d.
         Updates snake_body and coords_list according to direction.
         """
-        # Change coords according to new_dir
-        def update_coords(sect, new_dir):
-            coords = sect[0]
-            x, y = coords[0], coords[1]
-            
-            if new_dir == 'u':
-                y -= 1
-            elif new_dir == 'd':
-                y += 1
-            elif new_dir == 'l':
-                x -= 1
-            elif new_dir == 'r':
-                x += 1
-            
-            return (x, y), new_dir        
-        
-        # Update coordinates of sections
-        for i in range(self.snake_len):
-            sect = self.snake_body[i]
-            old_dir = sect[1]
-            
-            new_sect = update_coords(sect, new_dir)
-            self.snake_body[i] = new_sect
-            
-            new_dir = old_dir
+        # Every section takes the place and the direction of the one before it.
+        # So moving is just pushing a new head and popping the old tail.
+        # That's why a step takes the same time, however long the snake is.
+        head_x, head_y = self.coords_list[0]
+        step_x, step_y = DIRECTION_STEPS[new_dir]
+        new_head = (head_x + step_x, head_y + step_y)
+
+        self.snake_body.appendleft((new_head, new_dir))
+        self.coords_list.appendleft(new_head)
+        self.moves += 1
+
+        # A growing snake keeps its tail, so it is one section longer after the move.
+        if self.growth:
+            self.growth -= 1
+            self.snake_len += 1
+            removed = ()
+        else:
+            self.snake_body.pop()
+            removed = (self.coords_list.pop(),)
         
-        # Change occupied_coordinates
-        self.set_coords_list()
-        self.update_space()
+        # Change occupied_coordinates.
+        self.update_space(added=(new_head,), removed=removed)
 
 
     def grow_snake(self):
         """
-        Append a new section to snake_body.
+        Makes the snake one section longer.
+        The new section appears on the next move, where the tail stays in place.
         """
-        sect = self.snake_body[-1]
-        x, y = sect[0][0], sect[0][1]
-        
-        # Its direction is direction of the last section.
-        # And its coordinates are moved to opposite of that direction.
-        if sect[1] == 'u':
-            y += 1
-        elif sect[1] == 'd':
-            y -= 1
-        elif sect[1] == 'l':
-            x += 1
-        elif sect[1] == 'r':
-            x -= 1
-        
-        new_sect = ((x, y), sect[1])
-        self.snake_body.append(new_sect)
-
-        self.snake_len += 1
-        self.set_coords_list()
-        self.update_space()
+        self.growth += 1
 
 
     def eat_fruit(self, fruit):
@@ -389,7 +793,7 @@ class Snake(GameObject):
         """
         head_coords = self.coords_list[0]
 
-        for coords in self.coords_list[1:]:
+        for coords in islice(self.coords_list, 1, None):
             if head_coords == coords:
                 return True
         return False
@@ -419,15 +823,17 @@ class Fruit(GameObject):
     """
     Delicious fruit object.
     """
-    def __init__(self, coords):
+    def __init__(self, coords, occupancy=None):
         """
         Coordinates of the fruit.
+        occupancy is the Occupancy object it will be on, the shared one if None.
         """
         self.coords_list = [coords]
-        GameObject.__init__(self)
+        GameObject.__init__(self, occupancy)
 
 
 
 # This project is finished. But if I ever had to build such a snake game again,
 # I'll just store the coordinates of the head, and its past coordinates.
 # Tail sections are just following the head, after all.
+# (And that's how Snake moves now, with a deque of its past coordinates.)